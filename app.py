@@ -1,313 +1,322 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib.ticker as mticker
+import os
+import uuid
 from datetime import date
 
-# Set a darker style for matplotlib plots and adjust for dark background
-plt.style.use('seaborn-v0_8-darkgrid') # Using a style that works well with darker backgrounds
-
-# Customize matplotlib parameters for dark theme
-plt.rcParams.update({
-    "text.color": "white",
-    "axes.labelcolor": "white",
-    "xtick.color": "white",
-    "ytick.color": "white",
-    "axes.edgecolor": "white",
-    "figure.facecolor": "#262730", # Streamlit dark background color
-    "axes.facecolor": "#262730",   # Match axes background to Streamlit dark background
-    "savefig.facecolor": "#262730", # Savefig background color
-})
-
-
-# Function to plot monthly cashflow (Income vs Expense vs Savings)
-def plot_monthly_cashflow(df):
-    monthly = (df.groupby(['AnoMes','Tipo'])['Valor']
-                 .sum()
-                 .unstack(fill_value=0))
-
-    fig, ax = plt.subplots(figsize=(10, 5)) # Standardized figure size
-    # Ensure all three columns exist before plotting, provide default 0 if not
-    plot_data = monthly[['Income', 'Expense', 'Savings']].fillna(0) if all(col in monthly.columns for col in ['Income', 'Expense', 'Savings']) else monthly[['Income', 'Expense']].fillna(0)
-
-
-    plot_data.plot(kind='bar', stacked=False, ax=ax, color=['#4CAF50', '#FF7043', '#2196F3']) # Added colors for Savings
-    plt.title('Fluxo de Caixa Mensal: Entradas vs. Saídas vs. Economias', fontsize=14, color='white') # Adjusted title color
-    plt.ylabel('Valor (R$)', fontsize=10, color='white') # Adjusted font size and color
-    plt.xlabel('Mês', fontsize=10, color='white') # Adjusted font size and color
-    plt.xticks(rotation=45, ha='right', fontsize=8) # Adjusted font size
-    ax.yaxis.set_major_formatter(mticker.FormatStrFormatter('R$%.2f'))
-    plt.grid(axis='y', linestyle='--', alpha=0.7)
-    plt.legend(title='Tipo', bbox_to_anchor=(1.05, 1), loc='upper left', fontsize=8, facecolor='#262730', edgecolor='white') # Adjusted legend colors
-    plt.tight_layout()
-    return fig
-
-# Function to plot cumulative balance
-def plot_cumulative_balance(df):
-    # Ensure the dataframe has 'Data' and 'Valor_signed' columns before plotting
-    if 'Data' not in df.columns or 'Valor_signed' not in df.columns:
-        st.warning("Dados insuficientes para plotar o saldo acumulado.")
+from chart_cache import ChartCache
+from diagnostics import Profiler, StageTimer, configure_logging, diagnostics_requested, log_event
+from expense_table import SORT_COLUMNS, get_text_index, page_count, page_rows, select_rows
+from forecast import DEFAULT_HORIZON, DEFAULT_SCENARIOS, MAX_HORIZON, MIN_HORIZON, SCENARIOS, extend_balance, get_forecast
+from ledger import FilteredLedger, MonthlySummary, category_comparison, category_totals, slice_dates, slice_months
+from partitions import AccountsView, PartitionCatalog, parse_accounts
+from query import get_backend
+from render import EMPTY_MESSAGES, create_pool, render_charts
+from store import LedgerStore
+from vega_charts import CHART_BACKEND, VEGA_CHARTS
+from warmer import WATCH_INTERVAL, LedgerWatcher
+
+LEDGER_PATH = 'fluxo_caixa.xlsx'
+# Accounts shown by the dashboard, {name: workbook}, from LEDGER_ACCOUNTS ("Conta A=a.xlsx;Conta B=b.xlsx").
+# With more than one, ledgers are served from partitioned storage (see partitions.py).
+ACCOUNTS = parse_accounts(os.environ.get('LEDGER_ACCOUNTS', '')) or {'Principal': LEDGER_PATH}
+STAGE_HISTORY_LEN = 50 # Reruns per session kept for the diagnostics panel
+
+
+# Ledger store shared by every session of this server process. It keeps the prepared
+# ledger and its aggregates for the current version of the workbook, and folds rows
+# appended to the workbook into them instead of rebuilding everything.
+@st.cache_resource
+def get_ledger_store(path):
+    return LedgerStore(path)
+
+
+# Background thread that rebuilds the store's snapshot when the workbook changes and warms
+# the default view's charts before publishing it (see warmer.py); None when disabled
+@st.cache_resource
+def get_ledger_watcher(path):
+    if WATCH_INTERVAL <= 0:
         return None
-
-    saldo = df.groupby('Data')['Valor_signed'].sum().cumsum()
-
-    # Handle cases where saldo might be empty after filtering
-    if saldo.empty:
-        st.warning("Nenhum dado de saldo disponível para o período selecionado.")
-        return None
-
-    fig, ax = plt.subplots(figsize=(10, 5)) # Standardized figure size
-    saldo.plot(ax=ax, color='#2196F3') # Added color
-    plt.title('Saldo Líquido Acumulado ao Longo do Tempo', fontsize=14, color='white') # Adjusted title color
-    plt.ylabel('Saldo (R$)', fontsize=10, color='white') # Adjusted font size and color
-    plt.xlabel('Data', fontsize=10, color='white') # Adjusted font size and color
-    ax.yaxis.set_major_formatter(mticker.FormatStrFormatter('R$%.2f'))
-    plt.grid(True, linestyle='--', alpha=0.7)
-    plt.tight_layout()
-    return fig
-
-# Function to plot expense distribution by category (Pie Chart)
-def plot_expense_distribution_pie(df):
-    # Ensure the dataframe has 'Tipo', 'Categoria', and 'Valor' columns and contains expenses
-    if 'Tipo' not in df.columns or 'Categoria' not in df.columns or 'Valor' not in df.columns or df[df['Tipo'] == 'Expense'].empty:
-        st.warning("Dados de despesas insuficientes para plotar a distribuição por categoria.")
-        return None
-
-    # Filter for expenses and group by category
-    gastos_por_categoria = df[df['Tipo']=='Expense'].groupby('Categoria')['Valor'].sum()
-
-    # Handle cases where gastos_por_categoria might be empty after filtering
-    if gastos_por_categoria.empty:
-        st.warning("Nenhum dado de despesas por categoria disponível para os filtros selecionados.")
-        return None
-
-    # Sort values for better visualization
-    gastos_por_categoria = gastos_por_categoria.sort_values(ascending=False)
-
-    fig, ax = plt.subplots(figsize=(6, 6)) # Reduced figure size for pie chart
-    # Plot pie chart
-    wedges, texts, autotexts = ax.pie(gastos_por_categoria,
-                                      labels=gastos_por_categoria.index,
-                                      autopct='%1.1f%%', # Show percentages
-                                      startangle=140,
-                                      colors=plt.cm.viridis(gastos_por_categoria / gastos_por_categoria.max())) # Use a color map
-
-
-    plt.title('Distribuição de Despesas por Categoria (Percentual)', fontsize=14, color='white') # Adjusted font size and color
-    plt.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
-    plt.tight_layout()
-    return fig
-
-# Function to plot expense distribution by category (Bar Chart - total values)
-def plot_expense_distribution_bar(df):
-    # Ensure the dataframe has 'Tipo', 'Categoria', and 'Valor' columns and contains expenses
-    if 'Tipo' not in df.columns or 'Categoria' not in df.columns or 'Valor' not in df.columns or df[df['Tipo'] == 'Expense'].empty:
-        st.warning("Dados de despesas insuficientes para plotar a distribuição por categoria.")
-        return None
-
-    gastos = (df[df['Tipo']=='Expense']
-              .groupby('Categoria')['Valor']
-              .sum()
-              .sort_values(ascending=False))
-
-    # Handle cases where gastos might be empty after filtering
-    if gastos.empty:
-        st.warning("Nenhum dado de despesas por categoria disponível para os filtros selecionados.")
-        return None
-
-
-    fig, ax = plt.subplots(figsize=(10, 6)) # Standardized figure size
-    gastos.plot(kind='barh', ax=ax, color='#FFB74D') # Changed color
-    plt.title('Distribuição de Despesas por Categoria (Valores)', fontsize=14, color='white') # Adjusted font size and color
-    plt.xlabel('Valor (R$)', fontsize=10, color='white') # Adjusted font size and color
-    plt.ylabel('Categoria', fontsize=10, color='white') # Adjusted font size and color
-    ax.xaxis.set_major_formatter(mticker.FormatStrFormatter('R$%.2f'))
-    plt.grid(axis='x', linestyle='--', alpha=0.7)
-    plt.tight_layout()
-    return fig
-
-
-# Function to plot monthly expense evolution by category (Bar Chart)
-def plot_monthly_category_expenses(df):
-    # Ensure the dataframe has 'Tipo', 'AnoMes', 'Categoria', and 'Valor' columns and contains expenses
-    if 'Tipo' not in df.columns or 'AnoMes' not in df.columns or 'Categoria' not in df.columns or 'Valor' not in df.columns or df[df['Tipo'] == 'Expense'].empty:
-        st.warning("Dados de despesas insuficientes para plotar a evolução mensal por categoria.")
-        return None
-
-    monthly_category_expenses = (df[df['Tipo']=='Expense']
-                                 .groupby(['AnoMes', 'Categoria'])['Valor']
-                                 .sum()
-                                 .unstack(fill_value=0))
-
-    # Handle cases where monthly_category_expenses might be empty after filtering
-    if monthly_category_expenses.empty:
-         st.warning("Nenhum dado de despesas mensais por categoria disponível para os filtros selecionados.")
-         return None
-
-
-    fig, ax = plt.subplots(figsize=(12, 6)) # Standardized figure size
-    monthly_category_expenses.plot(kind='bar', stacked=True, ax=ax, cmap='tab20') # Changed color map
-    plt.title('Evolução Mensal das Despesas por Categoria', fontsize=14, color='white') # Adjusted font size and color
-    plt.ylabel('Valor (R$)', fontsize=10, color='white') # Adjusted font size and color
-    plt.xlabel('Mês', fontsize=10, color='white') # Adjusted font size and color
-    plt.xticks(rotation=45, ha='right', fontsize=8) # Adjusted font size
-    ax.yaxis.set_major_formatter(mticker.FormatStrFormatter('R$%.2f'))
-    plt.grid(axis='y', linestyle='--', alpha=0.7)
-    plt.legend(title='Categoria', bbox_to_anchor=(1.05, 1), loc='upper left', fontsize=8, facecolor='#262730', edgecolor='white') # Adjusted legend colors
-    plt.tight_layout()
-    return fig
-
-# Function to plot monthly income evolution
-def plot_monthly_income(df):
-    # Ensure the dataframe has 'Tipo', 'AnoMes', and 'Valor' columns and contains income
-    if 'Tipo' not in df.columns or 'AnoMes' not in df.columns or 'Valor' not in df.columns or df[df['Tipo'] == 'Income'].empty:
-        st.warning("Dados de receita insuficientes para plotar a evolução mensal.")
-        return None
-
-    monthly_income = (df[df['Tipo']=='Income']
-                      .groupby('AnoMes')['Valor']
-                      .sum())
-
-    # Handle cases where monthly_income might be empty after filtering
-    if monthly_income.empty:
-        st.warning("Nenhum dado de receita mensal disponível para o período selecionado.")
-        return None
-
-
-    fig, ax = plt.subplots(figsize=(10, 5)) # Standardized figure size
-    monthly_income.plot(ax=ax, color='#4CAF50') # Changed color
-    plt.title('Evolução Mensal da Receita', fontsize=14, color='white') # Adjusted title color
-    plt.ylabel('Valor (R$)', fontsize=10, color='white') # Adjusted font size and color
-    plt.xlabel('Mês', fontsize=10, color='white') # Adjusted font size and color
-    ax.yaxis.set_major_formatter(mticker.FormatStrFormatter('R$%.2f'))
-    plt.grid(True, linestyle='--', alpha=0.7)
-    plt.tight_layout()
-    return fig
-
-# Function to plot cumulative savings
-def plot_cumulative_savings(df):
-    # Ensure the dataframe has 'Tipo', 'Data', and 'Valor' columns and contains savings
-    if 'Tipo' not in df.columns or 'Data' not in df.columns or 'Valor' not in df.columns or df[df['Tipo'] == 'Savings'].empty:
-        st.warning("Dados de economias insuficientes para plotar as economias acumuladas.")
-        return None
-
-    savings_df = df[df['Tipo'] == 'Savings'].copy()
-
-    # Ensure 'Data' is sorted for correct cumulative sum
-    savings_df = savings_df.sort_values('Data')
-
-    cumulative_savings = savings_df.groupby('Data')['Valor'].sum().cumsum()
-
-    # Handle cases where cumulative_savings might be empty after filtering
-    if cumulative_savings.empty:
-        st.warning("Nenhum dado de economias acumuladas disponível para o período selecionado.")
-        return None
-
-    fig, ax = plt.subplots(figsize=(10, 5)) # Standardized figure size
-    cumulative_savings.plot(ax=ax, color='#2196F3') # Using a distinct color for savings
-    plt.title('Economias Acumuladas ao Longo do Tempo', fontsize=14, color='white') # Adjusted title color
-    plt.ylabel('Economias (R$)', fontsize=10, color='white') # Adjusted font size and color
-    plt.xlabel('Data', fontsize=10, color='white') # Adjusted font size and color
-    ax.yaxis.set_major_formatter(mticker.FormatStrFormatter('R$%.2f'))
-    plt.grid(True, linestyle='--', alpha=0.7)
-    plt.tight_layout()
-    return fig
+    chart_cache, pool = get_chart_cache(), get_render_pool()
+    watcher = LedgerWatcher(get_ledger_store(path), lambda snapshot: warm_default_view(snapshot, chart_cache, pool))
+    watcher.start()
+    return watcher
+
+
+# Render the charts of the default view (the 'Período' filter over the whole ledger, every
+# account) into the chart cache, under the keys main() builds for that view
+def warm_default_view(snapshot, chart_cache, pool):
+    if snapshot.date_range is None:
+        return
+    start_date, end_date = snapshot.date_range
+    filter_key = ((), 'Período', start_date, end_date)
+    cube = get_backend(snapshot).cube_for_range(start_date, end_date)
+    days = snapshot.prefix_sums.range_bounds(start_date, end_date)
+    jobs = {chart_id: cube for chart_id in ['monthly_cashflow', 'monthly_income', 'expense_distribution_bar',
+                                            'expense_distribution_pie', 'monthly_category_expenses']}
+    chart_keys = {}
+    if CHART_BACKEND != 'vega':
+        saldo = snapshot.prefix_sums.balance(days)
+        jobs['cumulative_balance'] = extend_balance(saldo, get_forecast(snapshot, DEFAULT_HORIZON, DEFAULT_SCENARIOS))
+        jobs['cumulative_savings'] = snapshot.prefix_sums.cumulative('Savings', days)
+        chart_keys['cumulative_balance'] = ((DEFAULT_HORIZON, DEFAULT_SCENARIOS),) # The default projection
+    for chart_id, image in render_charts(jobs, pool).items():
+        if image is not None:
+            chart_cache.put((chart_id, snapshot.version, filter_key) + chart_keys.get(chart_id, ()), image)
+
+
+# Per-account, per-month partitions of every configured account, shared by every session
+@st.cache_resource
+def get_partition_catalog():
+    return PartitionCatalog()
+
+
+# Rendered chart images shared by every session of this server process
+@st.cache_resource
+def get_chart_cache():
+    return ChartCache()
+
+
+# Worker processes that render charts concurrently, shared by every session
+@st.cache_resource
+def get_render_pool():
+    return create_pool()
+
+
+# Images for a section's charts. `jobs` maps chart id -> function returning the chart's
+# input data; charts missing from the cache are rendered together on the worker pool.
+# `chart_keys` adds per-chart parameters to a chart's cache key (chart id + version_key).
+# Render times go to `timer` as plot.<chart id> stages.
+def render_section(chart_cache, version_key, jobs, timer, chart_keys=None):
+    chart_keys = chart_keys or {}
+    images = {}
+    missing = {}
+    for chart_id, data in jobs.items():
+        images[chart_id] = chart_cache.get((chart_id,) + version_key + chart_keys.get(chart_id, ()))
+        if images[chart_id] is None:
+            missing[chart_id] = data()
+
+    # Hit/miss counts of this session (chart_cache.stats() covers every session)
+    session_stats = st.session_state.setdefault('chart_cache_session', {'hits': 0, 'misses': 0})
+    session_stats['hits'] += len(jobs) - len(missing)
+    session_stats['misses'] += len(missing)
+
+    timings = {}
+    for chart_id, image in render_charts(missing, get_render_pool(), timings).items():
+        if image is not None: # Empty charts are not cached, so their warning shows again
+            chart_cache.put((chart_id,) + version_key + chart_keys.get(chart_id, ()), image)
+        images[chart_id] = image
+    for chart_id, seconds in timings.items():
+        timer.add(f'plot.{chart_id}', seconds)
+    return images
+
+
+# Forecast of the whole ledger of `source`: the snapshot's own, or for several accounts one
+# built from what their partitions store (PartitionCatalog.forecast), without loading rows
+def source_forecast(source, horizon, scenarios):
+    if isinstance(source, AccountsView):
+        return source.forecast(horizon, scenarios)
+    return get_forecast(source, horizon, scenarios)
+
+
+# Snapshot of `source` covering `months`, unpacked the way the date filters use it, with
+# the query backend that aggregates it (see query.py)
+def load_months(source, months):
+    snapshot = source.for_months(months)
+    return snapshot, snapshot.df, get_backend(snapshot), snapshot.month_offsets
+
+
+def show_chart(images, chart_id):
+    if images[chart_id] is None:
+        st.warning(EMPTY_MESSAGES[chart_id])
+    else:
+        st.image(images[chart_id], width='stretch')
+
+
+# One page of the period's expenses, searched and sorted on the server (see expense_table.py)
+def show_expense_table(snapshot, filtered, filter_key, columns):
+    col_search, col_sort, col_order = st.columns([3, 2, 1])
+    with col_search:
+        text = st.text_input('Buscar por descrição ou categoria', key='expense_search').strip()
+    with col_sort:
+        sort = st.selectbox('Ordenar por', SORT_COLUMNS, key='expense_sort')
+    with col_order:
+        descending = st.toggle('Decrescente', key='expense_descending')
+
+    # Matching rows in display order, kept while only the page changes
+    selection_key = (snapshot.version, filter_key, text, sort, descending)
+    cached = st.session_state.get('expense_rows')
+    if cached is None or cached[0] != selection_key:
+        rows = select_rows(get_text_index(snapshot), filtered.ledger_positions('Expense'), text, sort, not descending)
+        st.session_state['expense_rows'] = cached = (selection_key, rows)
+        st.session_state['expense_page'] = 1 # A new selection starts on its first page
+    rows = cached[1]
+
+    if len(rows) == 0:
+        st.info("Nenhuma despesa encontrada para a busca.")
+        return
+    pages = page_count(len(rows))
+    page = st.number_input('Página', min_value=1, max_value=pages, key='expense_page')
+    st.caption(f"{len(rows)} despesas · página {page} de {pages}")
+    st.dataframe(page_rows(snapshot.df, rows, page, columns), hide_index=True)
+
+
+# Draw a chart in the browser from its downsampled Vega-Lite spec (see vega_charts.py)
+def show_vega_chart(chart_id, data, timer):
+    with timer.stage(f'plot.{chart_id}'):
+        chart = VEGA_CHARTS[chart_id](data)
+    if chart is None:
+        st.warning(EMPTY_MESSAGES[chart_id])
+    else:
+        st.vega_lite_chart(chart[0], chart[1], width='stretch')
+
+
+# Hidden panel (?diagnostics=1) with per-stage latency for this rerun and the session so
+# far, chart cache hit rates, memory held by the ledger and the profile when one was taken
+def show_diagnostics(timer, snapshot, date_filtered_df, chart_cache, profiler):
+    with st.expander('Diagnóstico', expanded=True):
+        history = pd.DataFrame(st.session_state['stage_history'])
+        st.markdown(f"Execução **{timer.run_id}** em {timer.total() * 1e3:,.1f} ms (plot.* ocorrem dentro das seções)")
+        st.dataframe(pd.DataFrame({
+            'última (ms)': history.iloc[-1] * 1e3,
+            'média da sessão (ms)': history.mean() * 1e3,
+            'p95 da sessão (ms)': history.quantile(0.95) * 1e3,
+            'execuções': history.count(),
+        }).round(2))
+
+        session_stats = st.session_state.get('chart_cache_session', {'hits': 0, 'misses': 0})
+        lookups = session_stats['hits'] + session_stats['misses']
+        st.json({
+            'chart_cache': chart_cache.stats(),
+            'chart_cache_session': {**session_stats, 'hit_rate': session_stats['hits'] / lookups if lookups else None},
+            'ledger': {
+                'version': snapshot.version,
+                'rows': len(snapshot.df),
+                'memory_bytes': int(snapshot.df.memory_usage(deep=True).sum()),
+                'cube_entries': len(snapshot.cube),
+                'filtered_rows': len(date_filtered_df),
+            },
+        })
+        if profiler is not None:
+            st.code(profiler.report())
 
 
 def main():
+    configure_logging()
+    session_id = st.session_state.setdefault('session_id', uuid.uuid4().hex[:8])
+    st.session_state['reruns'] = st.session_state.get('reruns', 0) + 1
+    timer = StageTimer(run_id=f"{session_id}-{st.session_state['reruns']}")
+    # Profile this rerun when asked for with ?profile= or DASHBOARD_PROFILE
+    profiler = Profiler.requested(st.query_params.get('profile'))
+    if profiler is not None:
+        profiler.start()
+
     st.set_page_config(layout="wide") # Set wide layout
     st.title('Dashboard de Análise Financeira')
     st.markdown("Este dashboard apresenta uma análise do fluxo de caixa, despesas e receitas ao longo do tempo.")
 
-    # Load data
-    df = st.cache_data(pd.read_excel)('fluxo_caixa.xlsx', parse_dates=['Data'])
-
-    # Preprocessing
-    df['AnoMes'] = df['Data'].dt.to_period('M')
-    # Adjusted Valor_signed to treat Expense and Savings as negative
-    df['Valor_signed'] = df.apply(lambda x: x['Valor'] * (1 if x['Tipo'] == 'Income' else -1), axis=1)
-
-    # Create AnoMes_dt here so it's available for all filter types
-    df['AnoMes_dt'] = df['Data'].dt.to_period('M').dt.to_timestamp()
-
-
     # Sidebar filters
     st.sidebar.header('Filtros')
     st.sidebar.markdown("Utilize os filtros abaixo para selecionar o período de interesse.")
 
+    # Load data (AnoMes, AnoMes_dt and Valor_signed are derived by prepare_ledger). `source`
+    # gives the picker options; the filters below ask it for just the months they need.
+    if len(ACCOUNTS) > 1:
+        catalog = get_partition_catalog()
+        catalog.refresh(ACCOUNTS)
+        # An empty selection shows every account
+        selected_accounts = st.sidebar.multiselect('Contas', catalog.accounts(), default=catalog.accounts()) or catalog.accounts()
+        source = catalog.view(selected_accounts)
+    else:
+        selected_accounts = []
+        path = next(iter(ACCOUNTS.values()))
+        get_ledger_watcher(path) # Started once per process; later versions arrive pre-warmed
+        source = get_ledger_store(path).current() # Whole ledger in memory
+    chart_cache = get_chart_cache()
+    timer.lap('load')
+
     filter_type = st.sidebar.radio("Selecionar Tipo de Filtro de Data:",
                                ('Período', 'Mês Específico', 'Comparar 2 Meses', 'Dia Atual'))
     
-    date_filtered_df = df.copy()
+    date_filtered_df = None # Filters below narrow this to a slice of the loaded ledger; nothing is copied
+    filtered_cube = None # Monthly cube restricted to the same date filter
+    filtered_days = None # Day bounds of the same date filter in snapshot.prefix_sums
     selected_months = []
     month1 = None
     month2 = None
+    filter_key = (filter_type,) # Filter parameters, part of the chart cache key
 
     if filter_type == 'Período':
-        min_date = df['Data'].min().date()
-        max_date = df['Data'].max().date()
+        # First and last dates of the ledger, derived once per data version
+        min_date, max_date = source.date_range
 
         start_date = st.sidebar.date_input('Data de Início', min_value=min_date, max_value=max_date, value=min_date)
         end_date = st.sidebar.date_input('Data de Fim', min_value=min_date, max_value=max_date, value=max_date)
 
         if start_date and end_date:
-            date_filtered_df = date_filtered_df[(date_filtered_df['Data'].dt.date >= start_date) & (date_filtered_df['Data'].dt.date <= end_date)]
+            snapshot, df, backend, month_offsets = load_months(source, pd.period_range(start_date, end_date, freq='M'))
+            date_filtered_df = slice_dates(df, start_date, end_date)
+            filtered_cube = backend.cube_for_range(start_date, end_date)
+            filtered_days = snapshot.prefix_sums.range_bounds(start_date, end_date)
+            filter_key = (filter_type, start_date, end_date)
 
     elif filter_type == 'Mês Específico':
-        unique_months = sorted(df['AnoMes_dt'].unique())
+        unique_months = source.months
         selected_month = st.sidebar.radio('Selecionar Mês', unique_months, format_func=lambda x: x.strftime('%Y-%m'))
 
         if selected_month:
-            date_filtered_df = date_filtered_df[date_filtered_df['AnoMes_dt'] == selected_month]
             selected_months = [pd.Period(selected_month, 'M')]
+            snapshot, df, backend, month_offsets = load_months(source, selected_months)
+            date_filtered_df = slice_months(df, month_offsets, selected_months)
+            filtered_cube = backend.cube_months(selected_months)
+            filtered_days = snapshot.prefix_sums.month_bounds(selected_months)
+            filter_key = (filter_type, selected_month)
 
     elif filter_type == 'Comparar 2 Meses':
-        unique_months = sorted(df['AnoMes_dt'].unique())
+        unique_months = source.months
         month1 = st.sidebar.selectbox('Selecionar Primeiro Mês', unique_months, index=len(unique_months)-1 if len(unique_months) > 0 else 0, format_func=lambda x: x.strftime('%Y-%m'))
         month2 = st.sidebar.selectbox('Selecionar Segundo Mês', unique_months, index=len(unique_months)-2 if len(unique_months) > 1 else 0, format_func=lambda x: x.strftime('%Y-%m'))
 
+        if month1 and month2:
+            selected_months = [pd.Period(month1, 'M'), pd.Period(month2, 'M')]
+            snapshot, df, backend, month_offsets = load_months(source, selected_months)
+            date_filtered_df = slice_months(df, month_offsets, selected_months)
+            filtered_cube = backend.cube_months(selected_months)
+            filtered_days = snapshot.prefix_sums.month_bounds(selected_months)
+            filter_key = (filter_type, month1, month2)
+
     elif filter_type == 'Dia Atual':
         today = date.today()
-        date_filtered_df = date_filtered_df[date_filtered_df['Data'].dt.date == today]
+        snapshot, df, backend, month_offsets = load_months(source, [pd.Period(today, 'M')])
+        date_filtered_df = slice_dates(df, today, today)
+        filtered_cube = backend.cube_for_range(today, today)
+        filtered_days = snapshot.prefix_sums.range_bounds(today, today)
+        filter_key = (filter_type, today)
     
         # Exibir informação do dia selecionado
         st.sidebar.info(f"Consultando dados de: {today.strftime('%d/%m/%Y')}")
 
-        if month1 and month2:
-            date_filtered_df = date_filtered_df[date_filtered_df['AnoMes_dt'].isin([month1, month2])]
-            selected_months = [pd.Period(month1, 'M'), pd.Period(month2, 'M')]
+    if date_filtered_df is None: # No date filter applied: the whole ledger
+        snapshot, df, backend, month_offsets = load_months(source, None)
+        date_filtered_df, filtered_cube, filtered_days = df, snapshot.cube, snapshot.prefix_sums.range_bounds()
+    filter_key = (tuple(selected_accounts),) + filter_key # Charts also depend on the accounts shown
 
     # Category filter removed as requested
     # all_categories = ['All'] + sorted(df['Categoria'].unique().tolist())
     # selected_categories = st.sidebar.multiselect('Selecionar Categoria', all_categories, default='All')
 
 
-    # Create dataframes filtered ONLY by date (category filter removed)
-    cashflow_filtered_df = date_filtered_df.copy()
-    cumulative_balance_filtered_df = date_filtered_df.copy()
-    expense_distribution_filtered_df = date_filtered_df[date_filtered_df['Tipo'] == 'Expense'].copy() # Filter only expenses
-    monthly_category_expense_filtered_df = date_filtered_df[date_filtered_df['Tipo'] == 'Expense'].copy() # Filter only expenses
-    income_filtered_df = date_filtered_df[date_filtered_df['Tipo'] == 'Income'].copy() # Filter only Income
-    cumulative_savings_filtered_df = date_filtered_df[date_filtered_df['Tipo'] == 'Savings'].copy() # Filter only Savings
-
+    # View of the rows filtered ONLY by date (category filter removed)
+    # Monthly charts and summaries are served from filtered_cube and the daily cumulative
+    # charts from the prefix sums; only the expense table reads rows, through per-Tipo views.
+    filtered = FilteredLedger(date_filtered_df, snapshot.tipo_masks)
+    timer.lap('filter')
 
-    # Calculate monthly summaries and changes within the main function
-    # Expenses should NOT include Savings
-    monthly_total_expenses = (cashflow_filtered_df[cashflow_filtered_df['Tipo'] == 'Expense']
-                              .groupby('AnoMes')['Valor']
-                              .sum())
 
-    monthly_total_income = (cashflow_filtered_df[cashflow_filtered_df['Tipo'] == 'Income']
-                            .groupby('AnoMes')['Valor']
-                            .sum())
-
-    # Calculate total savings monthly
-    monthly_total_savings = (cashflow_filtered_df[cashflow_filtered_df['Tipo'] == 'Savings']
-                             .groupby('AnoMes')['Valor']
-                             .sum())
-
-    # Calculate monthly net balance including savings
-    monthly_net_balance = monthly_total_income.sub(monthly_total_expenses, fill_value=0).sub(monthly_total_savings, fill_value=0)
+    # Monthly Income/Expense/Savings totals and net balance at the month edges of the
+    # filtered days (see ledger.MonthlySummary). Expenses should NOT include Savings
+    summary = MonthlySummary(snapshot.prefix_sums, filtered_days)
+    monthly_total_expenses = summary.series['Expense']
 
 
     # Display summaries using st.metric
@@ -315,10 +324,11 @@ def main():
 
     if filter_type == 'Mês Específico' and selected_months:
         current_month = selected_months[0]
-        last_month_expenses = monthly_total_expenses.get(current_month, 0)
-        last_month_income = monthly_total_income.get(current_month, 0)
-        last_month_balance = monthly_net_balance.get(current_month, 0)
-        last_month_savings = monthly_total_savings.get(current_month, 0)
+        totals = summary.month(current_month)
+        last_month_expenses = totals['Expense']
+        last_month_income = totals['Income']
+        last_month_balance = totals['Net']
+        last_month_savings = totals['Savings']
 
         st.write(f"Resumo para o mês de **{current_month.strftime('%Y-%m')}**:")
         col_metrics1, col_metrics2, col_metrics3, col_metrics4 = st.columns(4) # Added a column for savings
@@ -338,13 +348,8 @@ def main():
 
         # Display expense summary by category for the selected month (in boxes)
         st.subheader(f'Resumo de Despesas por Categoria ({current_month.strftime("%Y-%m")})')
-        if not expense_distribution_filtered_df.empty: # Use the filtered df for distribution (bar/pie)
-            last_month_expenses_by_category = (expense_distribution_filtered_df[
-                expense_distribution_filtered_df['AnoMes'] == current_month]
-                .groupby('Categoria')['Valor']
-                .sum()
-                .sort_values(ascending=False)
-            )
+        if not monthly_total_expenses.empty: # Use the filtered cube for distribution (bar/pie)
+            last_month_expenses_by_category = category_totals(filtered_cube, 'Expense', current_month).sort_values(ascending=False)
             if not last_month_expenses_by_category.empty:
                 # Create columns for each category
                 # Determine number of columns based on number of categories, max 4 per row
@@ -372,21 +377,12 @@ def main():
         month1_period = selected_months[0]
         month2_period = selected_months[1]
 
-        month1_expenses = monthly_total_expenses.get(month1_period, 0)
-        month2_expenses = monthly_total_expenses.get(month2_period, 0)
-        expense_change = month2_expenses - month1_expenses
-
-        month1_income = monthly_total_income.get(month1_period, 0)
-        month2_income = monthly_total_income.get(month2_period, 0)
-        income_change = month2_income - month1_income
-
-        month1_balance = monthly_net_balance.get(month1_period, 0)
-        month2_balance = monthly_net_balance.get(month2_period, 0)
-        balance_change = month2_balance - month1_balance
-
-        month1_savings = monthly_total_savings.get(month1_period, 0)
-        month2_savings = monthly_total_savings.get(month2_period, 0)
-        savings_change = month2_savings - month1_savings
+        # (month 2 total, change from month 1) per series
+        comparison = summary.compare(month1_period, month2_period)
+        month2_expenses, expense_change = comparison['Expense']
+        month2_income, income_change = comparison['Income']
+        month2_balance, balance_change = comparison['Net']
+        month2_savings, savings_change = comparison['Savings']
 
 
         st.write(f"Comparativo entre **{month1_period.strftime('%Y-%m')}** e **{month2_period.strftime('%Y-%m')}**:")
@@ -406,25 +402,17 @@ def main():
 
         # Display expense summary by category for the selected months (in boxes)
         st.subheader(f'Resumo de Despesas por Categoria ({month1_period.strftime("%Y-%m")} vs {month2_period.strftime("%Y-%m")})')
-        if not expense_distribution_filtered_df.empty:
-            expenses_month1 = (expense_distribution_filtered_df[expense_distribution_filtered_df['AnoMes'] == month1_period]
-                               .groupby('Categoria')['Valor'].sum())
-            expenses_month2 = (expense_distribution_filtered_df[expense_distribution_filtered_df['AnoMes'] == month2_period]
-                               .groupby('Categoria')['Valor'].sum())
-
-            # Combine categories from both months
-            all_categories_comparison = sorted(list(set(expenses_month1.index) | set(expenses_month2.index)))
+        if not monthly_total_expenses.empty:
+            # Categories from both months, with each month's total and the change
+            expenses_comparison = category_comparison(filtered_cube, 'Expense', month1_period, month2_period)
 
-            if all_categories_comparison:
+            if not expenses_comparison.empty:
                 # Determine number of columns based on number of categories, max 4 per row
-                num_categories = len(all_categories_comparison)
+                num_categories = len(expenses_comparison)
                 num_cols = min(num_categories, 4)
                 cols_comparison = st.columns(num_cols)
 
-                for i, category in enumerate(all_categories_comparison):
-                    val1 = expenses_month1.get(category, 0)
-                    val2 = expenses_month2.get(category, 0)
-                    change = val2 - val1
+                for i, (category, val1, val2, change) in enumerate(expenses_comparison.itertuples()):
                     with cols_comparison[i % num_cols]: # Use modulo to wrap around columns
                          st.markdown(f"""
                             <div style="border: 1px solid #ccc; padding: 10px; border-radius: 5px; margin-bottom: 10px;">
@@ -442,21 +430,11 @@ def main():
 
     else: # Default to Period filter summary
         # Calculate changes based on the last two months in the filtered data
-        last_month_expenses = monthly_total_expenses.iloc[-1] if not monthly_total_expenses.empty else 0
-        prev_month_expenses = monthly_total_expenses.iloc[-2] if len(monthly_total_expenses) >= 2 else 0
-        expense_change = last_month_expenses - prev_month_expenses
-
-        last_month_income = monthly_total_income.iloc[-1] if not monthly_total_income.empty else 0
-        prev_month_income = monthly_total_income.iloc[-2] if len(monthly_total_income) >= 2 else 0
-        income_change = last_month_income - prev_month_income
-
-        last_month_balance = monthly_net_balance.iloc[-1] if not monthly_net_balance.empty else 0
-        prev_month_balance = monthly_net_balance.iloc[-2] if len(monthly_net_balance) >= 2 else 0
-        balance_change = last_month_balance - prev_month_balance
-
-        last_month_savings = monthly_total_savings.iloc[-1] if not monthly_total_savings.empty else 0
-        prev_month_savings = monthly_total_savings.iloc[-2] if len(monthly_total_savings) >= 2 else 0
-        savings_change = last_month_savings - prev_month_savings
+        latest = summary.latest()
+        last_month_expenses, expense_change = latest['Expense']
+        last_month_income, income_change = latest['Income']
+        last_month_balance, balance_change = latest['Net']
+        last_month_savings, savings_change = latest['Savings']
 
 
         st.markdown("Resumo para o **período selecionado** (último mês exibido vs mês anterior):")
@@ -477,18 +455,13 @@ def main():
 
         # Display expense summary by category for the last month in the filtered data (in boxes)
         st.subheader('Resumo de Despesas por Categoria (Último Mês do Período)')
-        # Use expense_distribution_filtered_df for category breakdown
-        if not expense_distribution_filtered_df.empty: # Use the filtered df for distribution (bar/pie)
+        # Use the filtered cube for category breakdown
+        if not monthly_total_expenses.empty: # Use the filtered cube for distribution (bar/pie)
             # Get the last month from the filtered data for expense distribution
-            last_month_anomes = expense_distribution_filtered_df['AnoMes'].max() if not expense_distribution_filtered_df['AnoMes'].empty else None
+            last_month_anomes = monthly_total_expenses.index.max()
 
             if last_month_anomes:
-                last_month_expenses_by_category = (expense_distribution_filtered_df[
-                    expense_distribution_filtered_df['AnoMes'] == last_month_anomes]
-                    .groupby('Categoria')['Valor']
-                    .sum()
-                    .sort_values(ascending=False)
-                )
+                last_month_expenses_by_category = category_totals(filtered_cube, 'Expense', last_month_anomes).sort_values(ascending=False)
                 if not last_month_expenses_by_category.empty:
                      # Determine number of columns based on number of categories, max 4 per row
                     num_categories = len(last_month_expenses_by_category)
@@ -515,87 +488,135 @@ def main():
 
     # --- Dashboard Sections ---
 
+    timer.lap('summary')
     st.header('Visualizações Gráficas') # New header to group all charts sections
 
     # Visão Geral Mensal Section (with expander)
-    with st.expander("Visão Geral Mensal"):
+    monthly_section = st.expander("Visão Geral Mensal", key='section_monthly_overview', on_change='rerun')
+    with monthly_section:
         st.markdown("Comparativo mensal entre entradas, saídas e economias, e a evolução da receita.")
-        col1, col2 = st.columns(2)
-
-        with col1:
-            st.subheader('Fluxo de Caixa Mensal')
-            fig1 = plot_monthly_cashflow(cashflow_filtered_df)
-            if fig1:
-                st.pyplot(fig1)
-                plt.close(fig1)
-
-        with col2:
-            st.subheader('Evolução Mensal da Receita')
-            fig5 = plot_monthly_income(income_filtered_df)
-            if fig5:
-                st.pyplot(fig5)
-                plt.close(fig5)
+        # Charts are only computed and rendered while the section is open
+        if monthly_section.open:
+            images = render_section(chart_cache, (snapshot.version, filter_key), {
+                'monthly_cashflow': lambda: filtered_cube,
+                'monthly_income': lambda: filtered_cube,
+            }, timer)
+            col1, col2 = st.columns(2)
+
+            with col1:
+                st.subheader('Fluxo de Caixa Mensal')
+                show_chart(images, 'monthly_cashflow')
+
+            with col2:
+                st.subheader('Evolução Mensal da Receita')
+                show_chart(images, 'monthly_income')
+    timer.lap('section.monthly_overview')
 
     # Análise de Despesas por Categoria Section (with expander)
-    with st.expander("Análise de Despesas por Categoria"):
+    expenses_section = st.expander("Análise de Despesas por Categoria", key='section_expense_categories', on_change='rerun')
+    with expenses_section:
         st.markdown("Distribuição das despesas por categoria em valores e percentual para o período selecionado.")
-        col3, col4 = st.columns(2)
-
-        with col3:
-            st.subheader('Despesas por Categoria (Valores)')
-            fig_bar_dist = plot_expense_distribution_bar(expense_distribution_filtered_df)
-            if fig_bar_dist:
-                st.pyplot(fig_bar_dist)
-                plt.close(fig_bar_dist)
-
-        with col4:
-            st.subheader('Despesas por Categoria (Percentual)')
-            fig_pie_dist = plot_expense_distribution_pie(expense_distribution_filtered_df)
-            if fig_pie_dist:
-                st.pyplot(fig_pie_dist)
-                plt.close(fig_pie_dist)
-
+        # Charts are only computed and rendered while the section is open
+        if expenses_section.open:
+            images = render_section(chart_cache, (snapshot.version, filter_key), {
+                'expense_distribution_bar': lambda: filtered_cube,
+                'expense_distribution_pie': lambda: filtered_cube,
+            }, timer)
+            col3, col4 = st.columns(2)
+
+            with col3:
+                st.subheader('Despesas por Categoria (Valores)')
+                show_chart(images, 'expense_distribution_bar')
+
+            with col4:
+                st.subheader('Despesas por Categoria (Percentual)')
+                show_chart(images, 'expense_distribution_pie')
+    timer.lap('section.expense_categories')
 
     # Evolução ao Longo do Tempo Section (with expander)
-    with st.expander("Evolução ao Longo do Tempo"):
+    evolution_section = st.expander("Evolução ao Longo do Tempo", key='section_evolution', on_change='rerun')
+    with evolution_section:
         st.markdown("Visualização do saldo acumulado, a evolução mensal das despesas por categoria e a evolução das economias ao longo do período selecionado.")
-        col5, col6 = st.columns(2) # Use new columns for detailed evolution
-
-        with col5:
-            st.subheader('Saldo Líquido Acumulado') # Shortened title
-            fig2 = plot_cumulative_balance(cumulative_balance_filtered_df)
-            if fig2:
-                st.pyplot(fig2)
-                plt.close(fig2)
-
-        with col6:
-             st.subheader('Economias Acumuladas') # Shortened title
-             fig_savings = plot_cumulative_savings(cumulative_savings_filtered_df)
-             if fig_savings:
-                 st.pyplot(fig_savings)
-                 plt.close(fig_savings)
-
-        st.subheader('Evolução Mensal das Despesas por Categoria')
-        fig4 = plot_monthly_category_expenses(monthly_category_expense_filtered_df)
-        if fig4:
-            st.pyplot(fig4)
-            plt.close(fig4)
+        # Charts are only computed and rendered while the section is open
+        if evolution_section.open:
+            # Projection of the recurring transactions past the end of the ledger (see
+            # forecast.py), drawn when the filtered days reach the ledger's last day. `snapshot`
+            # may hold only the filter's months (several accounts), so both the end and the
+            # forecast come from the whole ledger of the selected accounts.
+            col_horizon, col_scenarios = st.columns([1, 2])
+            with col_horizon:
+                horizon = st.slider('Projeção (meses)', MIN_HORIZON, MAX_HORIZON, DEFAULT_HORIZON, step=6, key='forecast_horizon')
+            with col_scenarios:
+                scenarios = st.multiselect('Cenários da projeção', list(SCENARIOS), default=list(DEFAULT_SCENARIOS), key='forecast_scenarios')
+            lo, hi = filtered_days[-1] if filtered_days else (0, 0)
+            projected = (bool(scenarios) and hi > lo and source.date_range is not None
+                         and snapshot.prefix_sums.days[hi - 1].date() == source.date_range[1])
+            forecast_key = ((horizon, tuple(scenarios)),) if projected else ()
+
+            def cumulative_balance():
+                saldo = snapshot.prefix_sums.balance(filtered_days) # From the balance the filter opens with
+                return extend_balance(saldo, source_forecast(source, horizon, scenarios)) if projected else saldo
+
+            cumulative_inputs = {
+                # Slices of the snapshot's daily running totals (see ledger.PrefixSums)
+                'cumulative_balance': cumulative_balance,
+                'cumulative_savings': lambda: snapshot.prefix_sums.cumulative('Savings', filtered_days),
+            }
+            vega = CHART_BACKEND == 'vega' # Cumulative charts are drawn client-side instead of as images
+            images = render_section(chart_cache, (snapshot.version, filter_key), {
+                **({} if vega else cumulative_inputs),
+                'monthly_category_expenses': lambda: filtered_cube,
+            }, timer, {'cumulative_balance': forecast_key})
+            col5, col6 = st.columns(2) # Use new columns for detailed evolution
+
+            with col5:
+                st.subheader('Saldo Líquido Acumulado') # Shortened title
+                if vega:
+                    show_vega_chart('cumulative_balance', cumulative_inputs['cumulative_balance'](), timer)
+                else:
+                    show_chart(images, 'cumulative_balance')
+
+            with col6:
+                 st.subheader('Economias Acumuladas') # Shortened title
+                 if vega:
+                     show_vega_chart('cumulative_savings', cumulative_inputs['cumulative_savings'](), timer)
+                 else:
+                     show_chart(images, 'cumulative_savings')
+
+            st.subheader('Evolução Mensal das Despesas por Categoria')
+            show_chart(images, 'monthly_category_expenses')
+    timer.lap('section.evolution')
 
     # Add section for raw expense data table (already in expander)
     st.header('Dados de Despesas Detalhados')
     st.markdown("Visualização em tabela das despesas do período selecionado.")
 
-    # Filter dataframe to show only Expense type for the table
-    expense_data_for_table = date_filtered_df[date_filtered_df['Tipo'] == 'Expense'].copy()
-
-    if not expense_data_for_table.empty:
-        # Use st.expander to show/hide the table
-        with st.expander("Ver Tabela de Despesas"):
-            # Select relevant columns for display in the table
-            table_cols = ['Data', 'Descrição', 'Categoria', 'Valor', 'Recorrente']
-            st.dataframe(expense_data_for_table[table_cols].reset_index(drop=True))
+    if len(filtered.positions('Expense')) > 0:
+        # Use st.expander to show/hide the table; rows are only gathered and sent while it is open
+        table_section = st.expander("Ver Tabela de Despesas", key='section_expense_table', on_change='rerun')
+        with table_section:
+            if table_section.open:
+                # Only Expense rows, and only the relevant columns, are gathered for the table
+                table_cols = ['Data', 'Descrição', 'Categoria', 'Valor', 'Recorrente']
+                if selected_accounts:
+                    table_cols.append('Conta')
+                show_expense_table(snapshot, filtered, filter_key, table_cols)
     else:
         st.info("Nenhum dado de despesa disponível para o período selecionado.")
+    timer.lap('section.expense_table')
+
+    if profiler is not None:
+        profiler.stop()
+    history = st.session_state.setdefault('stage_history', [])
+    stages = {}
+    for stage, seconds in timer.stages:
+        stages[stage] = stages.get(stage, 0) + seconds
+    history.append(stages)
+    del history[:-STAGE_HISTORY_LEN]
+    log_event('rerun', run=timer.run_id, filter=filter_type, version=snapshot.version, ms=round(timer.total() * 1e3, 3))
+
+    if diagnostics_requested(st.query_params.get('diagnostics')):
+        show_diagnostics(timer, snapshot, date_filtered_df, chart_cache, profiler)
 
 
 if __name__ == '__main__':
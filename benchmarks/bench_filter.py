@@ -0,0 +1,49 @@
+# Date filter latency: full-scan .dt.date masks vs. binary search on the sorted ledger.
+#
+#   python -m benchmarks.bench_filter --sizes 10000 100000 1000000
+import argparse
+import time
+
+from benchmarks.synthetic import make_ledger
+from ledger import build_month_offsets, prepare_ledger, slice_dates, slice_months
+
+
+def _best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(sizes, repeat=5):
+    print(f"{'rows':>10} {'filter':>8} {'scan (ms)':>10} {'search (ms)':>12} {'speedup':>9}")
+    for n_rows in sizes:
+        df = prepare_ledger(make_ledger(n_rows))
+        offsets = build_month_offsets(df)
+        start_date = df['Data'].iloc[len(df) // 4].date()
+        end_date = df['Data'].iloc[3 * len(df) // 4].date()
+        month = df['AnoMes'].iloc[len(df) // 2]
+
+        cases = {
+            'range': (lambda: df[(df['Data'].dt.date >= start_date) & (df['Data'].dt.date <= end_date)],
+                      lambda: slice_dates(df, start_date, end_date)),
+            'month': (lambda: df[df['AnoMes_dt'] == month.to_timestamp()],
+                      lambda: slice_months(df, offsets, [month])),
+            'day': (lambda: df[df['Data'].dt.date == end_date],
+                    lambda: slice_dates(df, end_date, end_date)),
+        }
+        for name, (scan, search) in cases.items():
+            assert scan().equals(search())
+            scan_time = _best_of(scan, repeat)
+            search_time = _best_of(search, repeat)
+            print(f'{n_rows:>10} {name:>8} {scan_time * 1e3:>10.2f} {search_time * 1e3:>12.3f} {scan_time / search_time:>8.0f}x')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    run(args.sizes, args.repeat)
@@ -0,0 +1,65 @@
+# Forecast cost (forecast.py): the batched projection of every recurring series and
+# scenario vs. a loop over series, months and scenarios.
+#
+#   python -m benchmarks.bench_forecast --rows 100000 1000000 --horizon 60
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_ledger
+from forecast import SCENARIOS, TIPOS, apply_scenarios, last_month, project, recurring_series
+from ledger import prepare_ledger
+
+
+def _best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# Same scenario x month x Tipo totals, one series, month and scenario at a time
+def _looped(series, end, horizon, scenarios):
+    totals = np.zeros((len(scenarios), horizon, len(TIPOS)))
+    for p, name in enumerate(scenarios):
+        params = SCENARIOS[name]
+        for tipo, period, last, valor in series.itertuples(index=False):
+            t = TIPOS.index(tipo)
+            for k in range(horizon):
+                if (end + k + 1 - last) % period == 0:
+                    value = valor * (1 + params[tipo] / 100)
+                    if tipo == 'Expense':
+                        value *= (1 + params['inflation'] / 100) ** ((k + 1) / 12)
+                    totals[p, k, t] += value
+    return totals
+
+
+def run(sizes, horizon, repeat=3):
+    scenarios = list(SCENARIOS)
+    print(f"{'rows':>10} {'series':>7} {'detect (ms)':>12} {'batched (ms)':>13} {'looped (ms)':>12} {'speedup':>9}")
+    for n_rows in sizes:
+        df = prepare_ledger(make_ledger(n_rows))
+        end = last_month(df)
+        series = recurring_series(df)
+
+        def batched():
+            return apply_scenarios(project(series, end, horizon)[1], scenarios)
+
+        assert np.allclose(batched(), _looped(series, end, horizon, scenarios))
+        detect_time = _best_of(lambda: recurring_series(df), repeat)
+        batched_time = _best_of(batched, repeat)
+        looped_time = _best_of(lambda: _looped(series, end, horizon, scenarios), 1)
+        print(f'{n_rows:>10} {len(series):>7} {detect_time * 1e3:>12.2f} {batched_time * 1e3:>13.3f} '
+              f'{looped_time * 1e3:>12.1f} {looped_time / batched_time:>8.0f}x')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--horizon', type=int, default=60)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    run(args.rows, args.horizon, args.repeat)
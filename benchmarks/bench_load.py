@@ -0,0 +1,191 @@
+# Concurrent-session load test of app.py on synthetic ledgers. Each session is a headless
+# Streamlit AppTest; N of them run on threads of one process, sharing its caches (ledger
+# store, chart cache, query backends) as sessions of one server do. Every session loads
+# the page, then cycles through the four date filter modes with every expander open.
+#
+# Each case (ledger size x session count) runs in a fresh process from an empty working
+# directory, so it starts cold: the first session ingests the workbook (cold_start) while
+# the others wait for the store. Reported per case: p50/p95/p99 rerun latency, throughput
+# (reruns per second over all sessions), and the resident memory each session added.
+#
+# -o saves the JSON report; a saved report passed as --baseline flags every case whose
+# latency or memory grew, or throughput fell, by more than --tolerance (exit status 1).
+#
+#   python -m benchmarks.bench_load --rows 10000 100000 --sessions 1 4 8 -o load.json
+#   python -m benchmarks.bench_load --rows 10000 100000 --sessions 1 4 8 --baseline load.json
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from benchmarks.bench_suite import environment
+from benchmarks.synthetic import make_ledger, write_ledger_xlsx
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+FILTER_MODES = ['Período', 'Mês Específico', 'Comparar 2 Meses', 'Dia Atual']
+SECTIONS = ['section_monthly_overview', 'section_expense_categories', 'section_evolution', 'section_expense_table']
+
+# Report metric -> True when a larger value is a regression
+METRICS = {'p50': True, 'p95': True, 'p99': True, 'throughput': False, 'rss_per_session_mb': True}
+
+
+def _rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except OSError: # Not Linux: peak rather than current RSS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if sys.platform == 'darwin' else 2**10)
+
+
+# One rerun with `mode` selected and every expander open; returns its wall time.
+# Expanders aren't widgets of the AppTest tree, so their state is set before each run.
+def _rerun(at, mode=None):
+    if mode is not None:
+        at.sidebar.radio[0].set_value(mode)
+    for key in SECTIONS:
+        at.session_state[key] = True
+    start = time.perf_counter()
+    at.run()
+    return time.perf_counter() - start
+
+
+def _session(barrier, cycles, timeout, latencies, errors, apps):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    apps.append(at) # Kept alive until memory is measured
+    barrier.wait()
+    steps = [None] + FILTER_MODES * cycles # Page load, then the filter modes in turn
+    for mode in steps:
+        try:
+            latencies.append(_rerun(at, mode))
+        except Exception as exc: # Timeouts, or a run that never rendered the sidebar
+            errors.append(f'{mode}: {exc!r}')
+            return
+        errors.extend(f'{mode}: {e.message}' for e in at.exception)
+
+
+# Run in a child process: `n_sessions` concurrent sessions against the workbook at `path`
+def run_case(path, n_sessions, cycles, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    # Setting widget state between runs warns of a missing script context; it's expected here.
+    # A filter, since Streamlit resets its loggers' levels on every run.
+    logging.getLogger('streamlit.runtime.scriptrunner_utils.script_run_context').addFilter(
+        lambda record: 'missing ScriptRunContext' not in record.getMessage())
+
+    os.environ['LEDGER_ACCOUNTS'] = f'Principal={path}'
+    os.chdir(tempfile.mkdtemp(dir=os.path.dirname(path))) # Empty columnar cache and partitions
+
+    start = time.perf_counter()
+    AppTest.from_file(APP_PATH, default_timeout=timeout).run()
+    cold_start = time.perf_counter() - start
+
+    latencies, errors, apps = [], [], []
+    rss_before = _rss_mb()
+    barrier = threading.Barrier(n_sessions + 1)
+    threads = [threading.Thread(target=_session, args=(barrier, cycles, timeout, latencies, errors, apps))
+               for _ in range(n_sessions)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    rss_after = _rss_mb()
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if latencies else (np.nan,) * 3
+    return {
+        'reruns': len(latencies),
+        'errors': errors[:10],
+        'cold_start': cold_start,
+        'p50': float(p50),
+        'p95': float(p95),
+        'p99': float(p99),
+        'throughput': len(latencies) / elapsed,
+        'rss_mb': rss_after,
+        'rss_per_session_mb': (rss_after - rss_before) / n_sessions,
+    }
+
+
+# Cases of `report` whose metrics regressed past `tolerance` (a fraction) against `baseline`
+def compare(report, baseline, tolerance):
+    previous = {(case['rows'], case['sessions']): case for case in baseline['results']}
+    regressions = []
+    for case in report['results']:
+        base = previous.get((case['rows'], case['sessions']))
+        if case['errors']:
+            regressions.append(f"{case['rows']} rows x {case['sessions']} sessions: {len(case['errors'])} errors")
+        if base is None:
+            continue
+        for metric, higher_is_worse in METRICS.items():
+            old, new = base[metric], case[metric]
+            change = (new - old) / abs(old) if old else 0.0
+            if (change if higher_is_worse else -change) > tolerance:
+                regressions.append(f"{case['rows']} rows x {case['sessions']} sessions: {metric} {old:.3f} -> {new:.3f} "
+                                   f'({change:+.0%})')
+    return regressions
+
+
+def run(sizes, sessions, cycles, timeout, output=None, baseline=None, tolerance=0.25):
+    results = []
+    # A fresh interpreter per case: cold caches, and memory not inflated by earlier cases
+    context = multiprocessing.get_context('spawn')
+    print(f"{'rows':>10} {'sessions':>8} {'reruns':>7} {'cold (s)':>9} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} "
+          f"{'reruns/s':>9} {'MB/session':>11} {'errors':>7}", file=sys.stderr)
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_rows in sizes:
+            path = os.path.join(tmp, f'ledger_{n_rows}.xlsx')
+            write_ledger_xlsx(make_ledger(n_rows), path)
+            for n_sessions in sessions:
+                with context.Pool(1) as pool:
+                    case = {'rows': n_rows, 'sessions': n_sessions,
+                            **pool.apply(run_case, (path, n_sessions, cycles, timeout))}
+                results.append(case)
+                print(f"{n_rows:>10} {n_sessions:>8} {case['reruns']:>7} {case['cold_start']:>9.2f} {case['p50'] * 1e3:>9.1f} "
+                      f"{case['p95'] * 1e3:>9.1f} {case['p99'] * 1e3:>9.1f} {case['throughput']:>9.2f} "
+                      f"{case['rss_per_session_mb']:>11.1f} {len(case['errors']):>7}", file=sys.stderr)
+
+    report = {
+        'environment': {**environment(), 'chart_backend': os.environ.get('CHART_BACKEND', 'vega'),
+                        'query_backend': os.environ.get('QUERY_BACKEND', 'pandas')},
+        'cycles': cycles,
+        'results': results,
+    }
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if baseline:
+        with open(baseline, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}', file=sys.stderr)
+        return not regressions
+    return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--cycles', type=int, default=3, help='Passes over the four filter modes per session')
+    parser.add_argument('--timeout', type=float, default=300, help='Seconds allowed per rerun')
+    parser.add_argument('-o', '--output', help='Write the JSON report here instead of stdout')
+    parser.add_argument('--baseline', help='A previous report; exit with status 1 on regressions against it')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed relative change before flagging')
+    args = parser.parse_args()
+    ok = run(args.rows, args.sessions, args.cycles, args.timeout, args.output, args.baseline, args.tolerance)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,67 @@
+# Peak memory allocated per session rerun by the filter fan-out, measured with tracemalloc:
+# the old chain of .copy() derivatives vs. the FilteredLedger view.
+#
+#   python -m benchmarks.bench_memory --rows 1000000
+import argparse
+import tracemalloc
+
+from benchmarks.synthetic import make_ledger
+from ledger import FilteredLedger, prepare_ledger, slice_dates
+
+TABLE_COLS = ['Data', 'Descrição', 'Categoria', 'Valor', 'Recorrente']
+
+
+# The frames main() used to build on every rerun
+def legacy_fan_out(df, start_date, end_date):
+    date_filtered_df = df.copy()
+    date_filtered_df = date_filtered_df[(date_filtered_df['Data'].dt.date >= start_date) & (date_filtered_df['Data'].dt.date <= end_date)]
+    return [
+        date_filtered_df.copy(),
+        date_filtered_df.copy(),
+        date_filtered_df[date_filtered_df['Tipo'] == 'Expense'].copy(),
+        date_filtered_df[date_filtered_df['Tipo'] == 'Expense'].copy(),
+        date_filtered_df[date_filtered_df['Tipo'] == 'Income'].copy(),
+        date_filtered_df[date_filtered_df['Tipo'] == 'Savings'].copy(),
+        date_filtered_df[date_filtered_df['Tipo'] == 'Expense'].copy()[TABLE_COLS],
+    ]
+
+
+# What main() builds now
+def view_fan_out(df, start_date, end_date):
+    filtered = FilteredLedger(slice_dates(df, start_date, end_date))
+    return [
+        filtered.df,
+        filtered.tipo('Savings', ['Data', 'Tipo', 'Valor']),
+        filtered.tipo('Expense', TABLE_COLS),
+    ]
+
+
+def _peak(fn, *args):
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    result = fn(*args)
+    peak = tracemalloc.get_traced_memory()[1] - base
+    del result
+    return peak
+
+
+def run(n_rows):
+    df = prepare_ledger(make_ledger(n_rows))
+    start_date, end_date = df['Data'].iloc[0].date(), df['Data'].iloc[-1].date()
+    ledger_bytes = df.memory_usage(deep=True).sum()
+
+    tracemalloc.start()
+    legacy = _peak(legacy_fan_out, df, start_date, end_date)
+    view = _peak(view_fan_out, df, start_date, end_date)
+    tracemalloc.stop()
+
+    print(f'rows: {n_rows}, ledger: {ledger_bytes / 2**20:.1f} MiB')
+    print(f'copy fan-out peak (MiB): {legacy / 2**20:.1f} ({legacy / ledger_bytes:.1f}x ledger)')
+    print(f'view fan-out peak (MiB): {view / 2**20:.1f} ({view / ledger_bytes:.1f}x ledger)')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+    run(args.rows)
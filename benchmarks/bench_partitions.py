@@ -0,0 +1,69 @@
+# Partition pruning: loading a month of one account (and the cross-account monthly cube)
+# from the partition catalog vs. reading and concatenating every account's full ledger.
+#
+#   python -m benchmarks.bench_partitions --accounts 6 --rows 10000
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import make_ledger, write_ledger_xlsx
+from ledger import build_monthly_cube, prepare_ledger
+from partitions import PartitionCatalog
+from storage import load_ledger
+
+
+def _best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(n_accounts, n_rows, repeat):
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = {}
+        for i in range(n_accounts):
+            sources[f'Conta {i}'] = path = os.path.join(tmp, f'conta_{i}.xlsx')
+            write_ledger_xlsx(make_ledger(n_rows, seed=i), path)
+
+        catalog = PartitionCatalog(os.path.join(tmp, 'partitions'))
+        catalog.refresh(sources)
+        accounts = catalog.accounts()
+        month = catalog.months(accounts)[-1]
+        cache_dir = os.path.join(tmp, 'cache')
+        for path in sources.values():
+            load_ledger(path, cache_dir) # Warm the columnar cache so only the reads are timed
+
+        # Every account's full ledger, as a single-file design would have to load it
+        def concat_all():
+            df = prepare_ledger(pd.concat([load_ledger(path, cache_dir) for path in sources.values()], ignore_index=True))
+            return df, build_monthly_cube(df)
+
+        def fresh_catalog():
+            return PartitionCatalog(catalog.root) # No snapshots or aggregates held in memory yet
+
+        full = _best_of(concat_all, repeat)
+        one_month = _best_of(lambda: fresh_catalog().snapshot(accounts[:1], [month]), repeat)
+        all_accounts_month = _best_of(lambda: fresh_catalog().snapshot(accounts, [month]), repeat)
+        cube = _best_of(lambda: fresh_catalog().cube(accounts), repeat)
+
+        total = len(catalog.prune(accounts))
+        print(f'accounts: {n_accounts}, rows/account: {n_rows}, partitions: {total}')
+        print(f'load all ledgers + cube (ms):      {full * 1e3:>9.2f}')
+        print(f'1 account, 1 month (ms):           {one_month * 1e3:>9.2f}  ({len(catalog.prune(accounts[:1], [month]))}/{total} partitions read)')
+        print(f'all accounts, 1 month (ms):        {all_accounts_month * 1e3:>9.2f}  ({len(catalog.prune(accounts, [month]))}/{total} partitions read)')
+        print(f'cross-account cube, pre-aggregated: {cube * 1e3:>8.2f}  (0/{total} partitions read)')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--accounts', type=int, default=6)
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    run(args.accounts, args.rows, args.repeat)
@@ -0,0 +1,44 @@
+# Row-wise apply preprocessing vs. the vectorized prepare_ledger.
+#
+#   python -m benchmarks.bench_preprocess --rows 1000000
+import argparse
+import time
+
+from benchmarks.synthetic import make_ledger
+from ledger import prepare_ledger
+
+
+# The preprocessing main() used to run on every rerun
+def legacy_preprocess(df):
+    df = df.copy()
+    df['AnoMes'] = df['Data'].dt.to_period('M')
+    df['Valor_signed'] = df.apply(lambda x: x['Valor'] * (1 if x['Tipo'] == 'Income' else -1), axis=1)
+    df['AnoMes_dt'] = df['Data'].dt.to_period('M').dt.to_timestamp()
+    return df
+
+
+def _time(fn, df):
+    start = time.perf_counter()
+    result = fn(df)
+    return time.perf_counter() - start, result
+
+
+def run(n_rows):
+    df = make_ledger(n_rows)
+    legacy_time, legacy = _time(legacy_preprocess, df)
+    vectorized_time, vectorized = _time(prepare_ledger, df)
+
+    assert (legacy['Valor_signed'].to_numpy() == vectorized['Valor_signed'].to_numpy()).all()
+    assert (legacy['AnoMes_dt'] == vectorized['AnoMes_dt']).all()
+
+    print(f'rows: {n_rows}')
+    print(f'apply (s):          {legacy_time:.3f}')
+    print(f'prepare_ledger (s): {vectorized_time:.3f}')
+    print(f'speedup:            {legacy_time / vectorized_time:.0f}x')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+    run(args.rows)
@@ -0,0 +1,61 @@
+# Query backends (query.py) on the dashboard's filters: build time per snapshot and the
+# latency of each filter's cube query. Backends that aren't installed are skipped.
+#
+#   python -m benchmarks.bench_query --sizes 100000 1000000 --backends pandas duckdb sqlite
+import argparse
+import importlib.util
+import time
+
+from benchmarks.synthetic import make_ledger
+from ledger import LedgerSnapshot, prepare_ledger
+from query import BACKENDS
+
+
+def _best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _installed(kind):
+    return kind != 'duckdb' or importlib.util.find_spec('duckdb') is not None
+
+
+# Filter modes of the sidebar radio: name -> function of a backend
+def filter_queries(snapshot):
+    df = snapshot.df
+    start, end = df['Data'].iloc[len(df) // 4], df['Data'].iloc[3 * len(df) // 4]
+    month1, month2 = snapshot.month_offsets.index[-2], snapshot.month_offsets.index[-1]
+    today = df['Data'].iloc[-1]
+    return {
+        'periodo': lambda backend: backend.cube_for_range(start, end),
+        'mes_especifico': lambda backend: backend.cube_months([month2]),
+        'comparar_2_meses': lambda backend: backend.cube_months([month1, month2]),
+        'dia_atual': lambda backend: backend.cube_for_range(today, today),
+    }
+
+
+def run(sizes, kinds, repeat=5):
+    kinds = [kind for kind in kinds if _installed(kind)]
+    print(f"{'rows':>10} {'query':>18} " + ' '.join(f'{kind + " (ms)":>14}' for kind in kinds))
+    for n_rows in sizes:
+        snapshot = LedgerSnapshot(prepare_ledger(make_ledger(n_rows)))
+        build_times = [_best_of(lambda: BACKENDS[kind](snapshot), 1) for kind in kinds]
+        print(f"{n_rows:>10} {'build':>18} " + ' '.join(f'{seconds * 1e3:>14.2f}' for seconds in build_times))
+
+        backends = [BACKENDS[kind](snapshot) for kind in kinds]
+        for name, query in filter_queries(snapshot).items():
+            times = [_best_of(lambda: query(backend), repeat) for backend in backends]
+            print(f'{n_rows:>10} {name:>18} ' + ' '.join(f'{seconds * 1e3:>14.3f}' for seconds in times))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--backends', nargs='+', choices=sorted(BACKENDS), default=['pandas', 'duckdb', 'sqlite'])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    run(args.sizes, args.backends, args.repeat)
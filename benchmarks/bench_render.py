@@ -0,0 +1,58 @@
+# End-to-end render time of every dashboard chart, serial vs. on a worker process pool.
+#
+#   python -m benchmarks.bench_render --rows 100000 --workers 4
+import argparse
+import time
+
+from benchmarks.synthetic import make_ledger
+from ledger import PrefixSums, build_daily_totals, build_monthly_cube, prepare_ledger
+from render import create_pool, render_charts
+
+
+# The inputs main() hands to each chart for the full date range
+def page_jobs(df):
+    cube = build_monthly_cube(df)
+    prefix_sums = PrefixSums(build_daily_totals(df))
+    return {
+        'monthly_cashflow': cube,
+        'monthly_income': cube,
+        'expense_distribution_bar': cube,
+        'expense_distribution_pie': cube,
+        'cumulative_balance': prefix_sums.cumulative('Net', prefix_sums.range_bounds()),
+        'cumulative_savings': prefix_sums.cumulative('Savings', prefix_sums.range_bounds()),
+        'monthly_category_expenses': cube,
+    }
+
+
+def _best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(n_rows, workers, repeat=3):
+    jobs = page_jobs(prepare_ledger(make_ledger(n_rows)))
+    pool = create_pool(workers)
+    try:
+        render_charts(jobs, pool) # Warm up the workers (imports, fonts)
+        serial = _best_of(lambda: render_charts(jobs), repeat)
+        parallel = _best_of(lambda: render_charts(jobs, pool), repeat)
+    finally:
+        pool.shutdown()
+
+    print(f'rows: {n_rows}, charts: {len(jobs)}, workers: {workers}')
+    print(f'serial (s):   {serial:.3f}')
+    print(f'parallel (s): {parallel:.3f}')
+    print(f'speedup:      {serial / parallel:.2f}x')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    run(args.rows, args.workers, args.repeat)
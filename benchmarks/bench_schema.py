@@ -0,0 +1,50 @@
+# Memory per row and Tipo-filter cost of the ledger as loaded (text columns as Python
+# strings) vs. the compact schema prepare_ledger produces (categoricals, float32
+# installment counts) with the per-Tipo masks built once per snapshot.
+#
+#   python -m benchmarks.bench_schema --rows 1000000
+import argparse
+import time
+
+from benchmarks.synthetic import COLUMNS, TIPOS, make_ledger
+from ledger import FilteredLedger, build_tipo_masks, prepare_ledger
+
+
+def _best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _bytes_per_row(df):
+    return df[COLUMNS].memory_usage(deep=True, index=False).sum() / len(df)
+
+
+def run(n_rows, repeat):
+    raw = make_ledger(n_rows).astype({'Descrição': object, 'Categoria': object, 'Tipo': object,
+                                      'Recorrente': object, 'Frequência': object})
+    compact = prepare_ledger(raw.copy())
+    masks = build_tipo_masks(compact)
+
+    object_scan = _best_of(lambda: [raw['Tipo'] == tipo for tipo in TIPOS], repeat)
+    code_scan = _best_of(lambda: [FilteredLedger(compact).positions(tipo) for tipo in TIPOS], repeat)
+    mask_lookup = _best_of(lambda: [FilteredLedger(compact, masks).positions(tipo) for tipo in TIPOS], repeat)
+    build = _best_of(lambda: build_tipo_masks(compact), repeat)
+
+    print(f'rows: {n_rows}')
+    print(f'bytes/row, object strings: {_bytes_per_row(raw):.1f}')
+    print(f'bytes/row, compact schema: {_bytes_per_row(compact):.1f}')
+    print(f'Tipo filters, object scan (ms):    {object_scan * 1e3:.2f}')
+    print(f'Tipo filters, category codes (ms): {code_scan * 1e3:.2f}')
+    print(f'Tipo filters, precomputed (ms):    {mask_lookup * 1e3:.2f} (masks built once in {build * 1e3:.2f})')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    run(args.rows, args.repeat)
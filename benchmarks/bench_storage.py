@@ -0,0 +1,73 @@
+# Cold Excel load vs. warm memory-mapped Arrow load. First checks that incremental
+# ingestion keeps the cache equal to the workbook across appends and edits.
+#
+#   python -m benchmarks.bench_storage --sizes 10000 100000 1000000
+import argparse
+import os
+import tempfile
+import time
+
+import storage
+from benchmarks.synthetic import make_ledger, write_ledger_xlsx
+
+
+def _best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# Save `df` as the workbook, ingest it, and check the mode and that the cache matches it
+def _ingest_as(df, xlsx_path, cache_dir, expected_mode):
+    write_ledger_xlsx(df, xlsx_path)
+    mode, _ = storage.ingest_ledger(xlsx_path, cache_dir)
+    cached = storage.read_cached_ledger(xlsx_path, cache_dir)
+    assert mode == expected_mode, (mode, expected_mode)
+    assert storage.frame_digest(cached) == storage.frame_digest(storage.read_excel_ledger(xlsx_path)), expected_mode
+
+
+def check_incremental(n_rows=200, n_new=100):
+    rows = make_ledger(n_rows + 2 * n_new)
+    with tempfile.TemporaryDirectory() as tmp:
+        xlsx_path = os.path.join(tmp, 'ledger.xlsx')
+        cache_dir = os.path.join(tmp, 'cache')
+        _ingest_as(rows.iloc[:n_rows], xlsx_path, cache_dir, 'rebuilt')
+        _ingest_as(rows.iloc[:n_rows + n_new], xlsx_path, cache_dir, 'appended')
+        # An early row edited in the same save as an append must not be taken for an append
+        edited = rows.copy()
+        edited.loc[10, 'Valor'] = 999999
+        _ingest_as(edited, xlsx_path, cache_dir, 'rebuilt')
+        edited.loc[n_rows, 'Valor'] = 888888 # An edit alone
+        _ingest_as(edited, xlsx_path, cache_dir, 'rebuilt')
+        _ingest_as(edited, xlsx_path, cache_dir, 'unchanged') # Saved again with the same rows
+        assert storage.read_cached_ledger(xlsx_path, cache_dir)['Valor'].iloc[[10, n_rows]].tolist() == [999999, 888888]
+    print('incremental ingestion checks passed')
+
+
+def run(sizes, repeat=5):
+    check_incremental()
+    print(f"{'rows':>10} {'excel cold (s)':>15} {'arrow warm (s)':>15} {'speedup':>9}")
+    for n_rows in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            xlsx_path = os.path.join(tmp, 'ledger.xlsx')
+            cache_dir = os.path.join(tmp, 'cache')
+            write_ledger_xlsx(make_ledger(n_rows), xlsx_path)
+
+            # First load parses the workbook and builds the cache
+            start = time.perf_counter()
+            storage.load_ledger(xlsx_path, cache_dir)
+            cold = time.perf_counter() - start
+
+            warm = _best_of(lambda: storage.load_ledger(xlsx_path, cache_dir), repeat)
+            print(f'{n_rows:>10} {cold:>15.3f} {warm:>15.4f} {cold / warm:>8.0f}x')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    run(args.sizes, args.repeat)
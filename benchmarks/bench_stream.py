@@ -0,0 +1,76 @@
+# Peak memory and throughput of reading a workbook: pd.read_excel of the whole sheet vs.
+# the chunked openpyxl reader in streaming.py, both for building the monthly cube and daily
+# totals and for writing the columnar cache (storage.write_ledger_columnar).
+# Peak memory is measured with tracemalloc in a separate pass, since tracing slows both down;
+# it covers the Python and numpy allocations, not Arrow's own buffers.
+#
+#   python -m benchmarks.bench_stream --rows 200000 --chunk-size 50000
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.synthetic import make_ledger, write_ledger_xlsx
+from ledger import build_daily_totals, build_monthly_cube, prepare_ledger
+from storage import read_excel_ledger, write_columnar, write_ledger_columnar
+from streaming import stream_aggregates
+
+
+def full_read(path):
+    df = prepare_ledger(read_excel_ledger(path))
+    return build_monthly_cube(df), build_daily_totals(df)
+
+
+def streamed_read(path, chunk_size):
+    aggregates = stream_aggregates(path, chunk_size)
+    return aggregates.cube(), aggregates.daily()
+
+
+def full_cache(path, target):
+    write_columnar(read_excel_ledger(path), target)
+
+
+def streamed_cache(path, target, chunk_size):
+    write_ledger_columnar(path, target, chunk_size=chunk_size)
+
+
+def _measure(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def run(n_rows, chunk_size):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'ledger.xlsx')
+        write_ledger_xlsx(make_ledger(n_rows), path)
+        file_bytes = os.path.getsize(path)
+
+        full_time, full_peak = _measure(full_read, path)
+        stream_time, stream_peak = _measure(streamed_read, path, chunk_size)
+        target = os.path.join(tmp, 'ledger.arrow')
+        full_cache_time, full_cache_peak = _measure(full_cache, path, target)
+        stream_cache_time, stream_cache_peak = _measure(streamed_cache, path, target, chunk_size)
+
+    print(f'rows: {n_rows}, workbook: {file_bytes / 2**20:.1f} MiB, chunk size: {chunk_size}')
+    print(f'read_excel: {full_time:.2f} s, {n_rows / full_time:,.0f} rows/s, peak {full_peak / 2**20:.1f} MiB')
+    print(f'streamed:   {stream_time:.2f} s, {n_rows / stream_time:,.0f} rows/s, peak {stream_peak / 2**20:.1f} MiB')
+    print(f'cache, read_excel: {full_cache_time:.2f} s, {n_rows / full_cache_time:,.0f} rows/s, '
+          f'peak {full_cache_peak / 2**20:.1f} MiB')
+    print(f'cache, streamed:   {stream_cache_time:.2f} s, {n_rows / stream_cache_time:,.0f} rows/s, '
+          f'peak {stream_cache_peak / 2**20:.1f} MiB')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--chunk-size', type=int, default=50_000)
+    args = parser.parse_args()
+    run(args.rows, args.chunk_size)
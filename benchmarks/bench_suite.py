@@ -0,0 +1,180 @@
+# Stage-by-stage timings of the dashboard pipeline on synthetic ledgers, as JSON, so runs
+# can be diffed across versions. For each ledger size and category cardinality it times:
+#   load.*     - parsing the workbook, and reading the columnar cache
+#   prepare.*  - prepare_ledger and the per-version snapshot (cube, offsets, daily totals, prefix sums)
+#   filter.*   - each sidebar filter mode, as main() resolves it
+#   summary.*  - each summary branch of main() (MonthlySummary and category boxes)
+#   plot.*     - each chart, drawn and encoded to PNG
+#
+#   python -m benchmarks.bench_suite --rows 10000 100000 --categories 30 -o results.json
+#   python -m benchmarks.bench_suite --rows 1000000 --no-excel
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import matplotlib
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_ledger, write_ledger_xlsx
+from ledger import (LedgerSnapshot, MonthlySummary, PrefixSums, build_daily_totals, category_comparison,
+                    category_totals, cube_for_range, cube_months, prepare_ledger, slice_dates, slice_months)
+from render import render_chart
+from storage import ingest_ledger, read_cached_ledger, read_excel_ledger
+
+
+def _best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# Filter modes of the sidebar radio: name -> function returning (rows view, cube, day bounds)
+def filter_modes(snapshot):
+    df, cube, prefix_sums = snapshot.df, snapshot.cube, snapshot.prefix_sums
+    start, end = df['Data'].iloc[len(df) // 4], df['Data'].iloc[3 * len(df) // 4]
+    month1, month2 = snapshot.month_offsets.index[-2], snapshot.month_offsets.index[-1]
+    today = df['Data'].iloc[-1]
+
+    def periodo():
+        return slice_dates(df, start, end), cube_for_range(df, cube, start, end), prefix_sums.range_bounds(start, end)
+
+    def months(selected):
+        return lambda: (slice_months(df, snapshot.month_offsets, selected), cube_months(cube, selected),
+                        prefix_sums.month_bounds(selected))
+
+    def dia_atual():
+        return (slice_dates(df, today, today), cube_for_range(df, cube, today, today),
+                prefix_sums.range_bounds(today, today))
+
+    return {
+        'periodo': periodo,
+        'mes_especifico': months([month2]),
+        'comparar_2_meses': months([month1, month2]),
+        'dia_atual': dia_atual,
+    }
+
+
+# Summary branches of main(): name -> function computing what that branch displays
+def summary_branches(snapshot, month1, month2):
+    cube, prefix_sums = snapshot.cube, snapshot.prefix_sums
+
+    def mes_especifico():
+        summary = MonthlySummary(prefix_sums, prefix_sums.month_bounds([month2]))
+        return summary.month(month2), category_totals(cube, 'Expense', month2).sort_values(ascending=False)
+
+    def comparar_2_meses():
+        summary = MonthlySummary(prefix_sums, prefix_sums.month_bounds([month1, month2]))
+        return summary.compare(month1, month2), category_comparison(cube, 'Expense', month1, month2)
+
+    def periodo():
+        summary = MonthlySummary(prefix_sums)
+        last_month = summary.series['Expense'].index.max()
+        return summary.latest(), category_totals(cube, 'Expense', last_month).sort_values(ascending=False)
+
+    return {'mes_especifico': mes_especifico, 'comparar_2_meses': comparar_2_meses, 'periodo': periodo}
+
+
+# Inputs main() hands to each chart for the full date range
+def chart_inputs(snapshot):
+    return {
+        'monthly_cashflow': snapshot.cube,
+        'monthly_income': snapshot.cube,
+        'expense_distribution_bar': snapshot.cube,
+        'expense_distribution_pie': snapshot.cube,
+        'cumulative_balance': snapshot.prefix_sums.balance(snapshot.prefix_sums.range_bounds()),
+        'cumulative_savings': snapshot.prefix_sums.cumulative('Savings', snapshot.prefix_sums.range_bounds()),
+        'monthly_category_expenses': snapshot.cube,
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    return {
+        'git_revision': _git_revision(),
+        'timestamp': pd.Timestamp.now(tz='UTC').isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'matplotlib': matplotlib.__version__,
+    }
+
+
+# Time every stage for one ledger; returns [{'stage', 'seconds'}]
+def run_case(n_rows, n_categories, repeat, excel=True):
+    timings = []
+
+    def record(stage, fn, times=repeat):
+        timings.append({'stage': stage, 'seconds': _best_of(fn, times)})
+
+    raw = make_ledger(n_rows, n_categories=n_categories)
+    if excel:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'ledger.xlsx')
+            cache_dir = os.path.join(tmp, 'cache')
+            write_ledger_xlsx(raw, path)
+            record('load.excel', lambda: read_excel_ledger(path), times=1)
+            ingest_ledger(path, cache_dir)
+            record('load.columnar_cache', lambda: read_cached_ledger(path, cache_dir))
+
+    record('prepare.prepare_ledger', lambda: prepare_ledger(raw.copy()))
+    df = prepare_ledger(raw.copy())
+    record('prepare.snapshot', lambda: LedgerSnapshot(df))
+    record('prepare.prefix_sums', lambda: PrefixSums(build_daily_totals(df)))
+    snapshot = LedgerSnapshot(df)
+
+    for name, fn in filter_modes(snapshot).items():
+        record(f'filter.{name}', fn)
+
+    month1, month2 = snapshot.month_offsets.index[-2], snapshot.month_offsets.index[-1]
+    for name, fn in summary_branches(snapshot, month1, month2).items():
+        record(f'summary.{name}', fn)
+
+    for chart_id, data in chart_inputs(snapshot).items():
+        record(f'plot.{chart_id}', lambda: render_chart(chart_id, data))
+
+    return timings
+
+
+def run(sizes, categories, repeat, excel=True, output=None):
+    results = []
+    for n_rows in sizes:
+        for n_categories in categories:
+            for timing in run_case(n_rows, n_categories, repeat, excel):
+                results.append({'rows': n_rows, 'categories': n_categories, **timing})
+                print(f"{n_rows:>10} {n_categories:>4} {timing['stage']:<36} {timing['seconds'] * 1e3:>10.2f} ms", file=sys.stderr)
+
+    report = {'environment': environment(), 'repeat': repeat, 'results': results}
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--categories', type=int, nargs='+', default=[30])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-excel', action='store_true', help='Skip the workbook stages (slow to generate at large sizes)')
+    parser.add_argument('-o', '--output', help='Write the JSON report here instead of stdout')
+    args = parser.parse_args()
+    run(args.rows, args.categories, args.repeat, not args.no_excel, args.output)
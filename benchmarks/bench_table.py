@@ -0,0 +1,67 @@
+# Expense table cost per rerun: gathering and serializing every expense row of the period
+# (what st.dataframe used to receive) vs. one server-side page, and substring search as
+# a scan over the strings vs. the inverted index (expense_table.py).
+#
+#   python -m benchmarks.bench_table --sizes 100000 1000000
+import argparse
+import time
+
+import pyarrow as pa
+
+from benchmarks.synthetic import make_ledger
+from expense_table import TextIndex, page_rows, select_rows
+from ledger import FilteredLedger, LedgerSnapshot, prepare_ledger
+
+TABLE_COLUMNS = ['Data', 'Descrição', 'Categoria', 'Valor', 'Recorrente']
+
+
+def _best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _scan_search(frame, text):
+    text = text.casefold()
+    mask = False
+    for column in ['Descrição', 'Categoria']:
+        mask = mask | frame[column].astype(str).str.casefold().str.contains(text, regex=False)
+    return frame[mask]
+
+
+def run(sizes, repeat=5):
+    print(f"{'rows':>10} {'case':>16} {'full (ms)':>10} {'paged (ms)':>11} {'speedup':>9}")
+    for n_rows in sizes:
+        snapshot = LedgerSnapshot(prepare_ledger(make_ledger(n_rows)))
+        filtered = FilteredLedger(snapshot.df, snapshot.tipo_masks)
+        expense_rows = filtered.ledger_positions('Expense')
+        start = time.perf_counter()
+        index = TextIndex(snapshot.df)
+        print(f"{n_rows:>10} {'index build':>16} {(time.perf_counter() - start) * 1e3:>10.2f}")
+        text = snapshot.df['Descrição'].cat.categories[1][-3:] # Matches a slice of the descriptions
+
+        cases = {
+            'table': (lambda: pa.Table.from_pandas(filtered.tipo('Expense', TABLE_COLUMNS)),
+                      lambda: pa.Table.from_pandas(page_rows(snapshot.df, expense_rows, 1, TABLE_COLUMNS))),
+            'search': (lambda: pa.Table.from_pandas(_scan_search(filtered.tipo('Expense', TABLE_COLUMNS), text)),
+                       lambda: pa.Table.from_pandas(page_rows(snapshot.df, select_rows(index, expense_rows, text), 1,
+                                                              TABLE_COLUMNS))),
+            'sort_by_valor': (lambda: pa.Table.from_pandas(filtered.tipo('Expense', TABLE_COLUMNS).sort_values('Valor')),
+                              lambda: pa.Table.from_pandas(page_rows(snapshot.df, select_rows(index, expense_rows, '', 'Valor'),
+                                                                     1, TABLE_COLUMNS))),
+        }
+        for name, (full, paged) in cases.items():
+            full_time = _best_of(full, repeat)
+            paged_time = _best_of(paged, repeat)
+            print(f'{n_rows:>10} {name:>16} {full_time * 1e3:>10.2f} {paged_time * 1e3:>11.3f} {full_time / paged_time:>8.0f}x')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    run(args.sizes, args.repeat)
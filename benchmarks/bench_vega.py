@@ -0,0 +1,42 @@
+# Payload size and server-side time of the cumulative balance chart as the history grows:
+# matplotlib PNG of every daily point vs. the LTTB-downsampled Vega-Lite spec.
+#
+#   python -m benchmarks.bench_vega --years 1 10 50 --max-points 1000
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from render import render_chart
+from vega_charts import cumulative_balance_spec
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def run(years, max_points):
+    print(f"{'days':>8} {'png (KiB)':>10} {'png (ms)':>9} {'points':>7} {'spec (KiB)':>11} {'spec (ms)':>10}")
+    rng = np.random.default_rng(0)
+    for n_years in years:
+        days = pd.date_range('2000-01-01', periods=int(n_years * 365), freq='D', name='Data')
+        saldo = pd.Series(rng.normal(50, 400, len(days)), index=days, name='Net').cumsum()
+
+        png, png_time = _timed(lambda: render_chart('cumulative_balance', saldo))
+        (data, spec), spec_time = _timed(lambda: cumulative_balance_spec(saldo, max_points))
+        # Roughly what Streamlit ships: the spec plus the data as JSON records
+        payload = json.dumps({'spec': spec, 'data': data.to_json(orient='records', date_format='iso')})
+        print(f'{len(days):>8} {len(png) / 1024:>10.1f} {png_time * 1e3:>9.1f} {len(data):>7} '
+              f'{len(payload) / 1024:>11.1f} {spec_time * 1e3:>10.2f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--years', type=float, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--max-points', type=int, default=1000)
+    args = parser.parse_args()
+    run(args.years, args.max_points)
@@ -0,0 +1,61 @@
+# Import-time budget for the dashboard, measured with `python -X importtime`. Fails (exit
+# status 1) when importing app takes longer than the budget or pulls in a module that
+# should only load when a chart is rendered, so it can guard against regressions in CI.
+#
+#   python -m benchmarks.check_importtime --budget-ms 800
+import argparse
+import subprocess
+import sys
+
+# Cumulative import time allowed for `import app`, best of --repeat fresh interpreters:
+# about 1.3x the 622 ms measured with the deferred imports in place, so an eager import of
+# anything heavy fails. Machine-dependent; pass --budget-ms on slower hardware.
+IMPORT_BUDGET_MS = 800
+
+# Modules that must not be imported until a chart is actually drawn (see render.render_chart)
+DEFERRED_MODULES = ['matplotlib', 'charts']
+
+
+# {module: (self µs, cumulative µs)} for one fresh interpreter importing `module`
+def measure(module):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, check=True)
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def run(module, budget_ms, repeat, top):
+    runs = [measure(module) for _ in range(repeat)]
+    best = min(runs, key=lambda timings: timings[module][1])
+    total_ms = best[module][1] / 1e3
+
+    print(f'import {module}: {total_ms:.1f} ms (best of {repeat}, budget {budget_ms} ms)')
+    print('heaviest top-level imports:')
+    top_level = sorted(((timing[1], name) for name, timing in best.items() if '.' not in name and name != module), reverse=True)
+    for cumulative_us, name in top_level[:top]:
+        print(f'  {name:<24} {cumulative_us / 1e3:>8.1f} ms')
+
+    failures = []
+    if total_ms > budget_ms:
+        failures.append(f'import {module} took {total_ms:.1f} ms, over the {budget_ms} ms budget')
+    for name in DEFERRED_MODULES:
+        if name in best:
+            failures.append(f'{name} is imported eagerly; it should load only when a chart is rendered')
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    return not failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--budget-ms', type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--top', type=int, default=8)
+    args = parser.parse_args()
+    sys.exit(0 if run(args.module, args.budget_ms, args.repeat, args.top) else 1)
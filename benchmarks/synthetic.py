@@ -0,0 +1,32 @@
+# Synthetic ledgers with the same schema as fluxo_caixa.xlsx, for benchmarks
+import numpy as np
+import pandas as pd
+
+COLUMNS = ['Data', 'Descrição', 'Categoria', 'Valor', 'Tipo', 'Recorrente', 'Frequência', 'Nº Parcelas', 'Parcela Atual']
+TIPOS = ['Expense', 'Income', 'Savings']
+TIPO_WEIGHTS = [0.8, 0.15, 0.05]
+
+
+# Build a ledger of `n_rows` transactions spread evenly over `n_days` days
+def make_ledger(n_rows, n_categories=30, n_descriptions=500, n_days=3 * 365, start='2022-01-01', seed=0):
+    rng = np.random.default_rng(seed)
+    days = np.sort(rng.integers(0, n_days, n_rows))
+    tipo = rng.choice(TIPOS, size=n_rows, p=TIPO_WEIGHTS)
+    recorrente = rng.random(n_rows) < 0.4
+    parcelas = np.where(recorrente, 12.0, 1.0)
+
+    return pd.DataFrame({
+        'Data': pd.Timestamp(start) + pd.to_timedelta(days, unit='D'),
+        'Descrição': np.char.add('Descrição ', rng.integers(0, n_descriptions, n_rows).astype(str)),
+        'Categoria': np.char.add('Categoria ', rng.integers(0, n_categories, n_rows).astype(str)),
+        'Valor': np.round(rng.lognormal(4.5, 1.3, n_rows), 2),
+        'Tipo': tipo,
+        'Recorrente': np.where(recorrente, 'y', 'n'),
+        'Frequência': np.where(recorrente, 'Mensal', 'Unica'),
+        'Nº Parcelas': parcelas,
+        'Parcela Atual': np.minimum(rng.integers(1, 13, n_rows), parcelas),
+    }, columns=COLUMNS)
+
+
+def write_ledger_xlsx(df, path):
+    df.to_excel(path, index=False)
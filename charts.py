@@ -0,0 +1,219 @@
+# Dashboard charts, built with matplotlib's object-oriented Figure/Axes API.
+#
+# Figures are created with matplotlib.figure.Figure rather than pyplot, so no global
+# pyplot state is touched and charts can be rendered concurrently on threads or worker
+# processes. Each plot_* function returns a Figure, or None when the selection has no
+# data for that chart (render.EMPTY_MESSAGES holds the warning shown instead).
+#
+# Importing this module loads matplotlib and applies the dark theme, so it is only
+# imported by render.render_chart, the first time a chart is actually drawn in a process.
+import io
+
+import matplotlib as mpl
+import matplotlib.style
+import matplotlib.ticker as mticker
+from matplotlib.artist import setp
+from matplotlib.figure import Figure
+
+from ledger import category_totals, monthly_by_tipo, monthly_category_totals, monthly_totals
+
+# Same defaults st.pyplot uses, so rendered images look identical
+SAVEFIG_OPTIONS = {'bbox_inches': 'tight', 'dpi': 200, 'format': 'png'}
+
+# Set a darker style for matplotlib plots and adjust for dark background (once per process, on import)
+mpl.style.use('seaborn-v0_8-darkgrid') # Using a style that works well with darker backgrounds
+
+# Customize matplotlib parameters for dark theme
+mpl.rcParams.update({
+    "text.color": "white",
+    "axes.labelcolor": "white",
+    "xtick.color": "white",
+    "ytick.color": "white",
+    "axes.edgecolor": "white",
+    "figure.facecolor": "#262730", # Streamlit dark background color
+    "axes.facecolor": "#262730",   # Match axes background to Streamlit dark background
+    "savefig.facecolor": "#262730", # Savefig background color
+})
+
+
+def figure_to_png(fig):
+    buffer = io.BytesIO()
+    fig.savefig(buffer, **SAVEFIG_OPTIONS)
+    return buffer.getvalue()
+
+
+def _rotate_xticks(ax):
+    ax.tick_params(axis='x', labelrotation=45, labelsize=8) # Adjusted font size
+    setp(ax.get_xticklabels(), ha='right')
+
+
+# Function to plot monthly cashflow (Income vs Expense vs Savings) from the monthly cube
+def plot_monthly_cashflow(cube):
+    monthly = monthly_by_tipo(cube)
+
+    # Handle cases where monthly might be empty after filtering
+    if monthly.empty:
+        return None
+
+    fig = Figure(figsize=(10, 5)) # Standardized figure size
+    ax = fig.subplots()
+    # Savings is only plotted when present; missing Income/Expense columns default to 0
+    plot_columns = ['Income', 'Expense', 'Savings'] if 'Savings' in monthly.columns else ['Income', 'Expense']
+    plot_data = monthly.reindex(columns=plot_columns, fill_value=0)
+
+    plot_data.plot(kind='bar', stacked=False, ax=ax, color=['#4CAF50', '#FF7043', '#2196F3']) # Added colors for Savings
+    ax.set_title('Fluxo de Caixa Mensal: Entradas vs. Saídas vs. Economias', fontsize=14, color='white') # Adjusted title color
+    ax.set_ylabel('Valor (R$)', fontsize=10, color='white') # Adjusted font size and color
+    ax.set_xlabel('Mês', fontsize=10, color='white') # Adjusted font size and color
+    _rotate_xticks(ax)
+    ax.yaxis.set_major_formatter(mticker.FormatStrFormatter('R$%.2f'))
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+    ax.legend(title='Tipo', bbox_to_anchor=(1.05, 1), loc='upper left', fontsize=8, facecolor='#262730', edgecolor='white') # Adjusted legend colors
+    fig.tight_layout()
+    return fig
+
+# Function to plot the cumulative balance per day (see ledger.PrefixSums.cumulative), or a
+# frame of it ('Saldo') plus projected scenarios (see forecast.extend_balance)
+def plot_cumulative_balance(saldo):
+    projection = None
+    if saldo.ndim == 2:
+        projection = saldo.drop(columns='Saldo')
+        saldo = saldo['Saldo'].dropna()
+
+    # Handle cases where saldo might be empty after filtering
+    if saldo.empty:
+        return None
+
+    fig = Figure(figsize=(10, 5)) # Standardized figure size
+    ax = fig.subplots()
+    saldo.plot(ax=ax, color='#2196F3', label='Realizado') # Added color
+    if projection is not None:
+        for scenario in projection.columns:
+            projection[scenario].dropna().plot(ax=ax, linestyle='--', label=f'Projeção ({scenario})')
+        ax.legend(fontsize=8, facecolor='#262730', edgecolor='white')
+    ax.set_title('Saldo Líquido Acumulado ao Longo do Tempo', fontsize=14, color='white') # Adjusted title color
+    ax.set_ylabel('Saldo (R$)', fontsize=10, color='white') # Adjusted font size and color
+    ax.set_xlabel('Data', fontsize=10, color='white') # Adjusted font size and color
+    ax.yaxis.set_major_formatter(mticker.FormatStrFormatter('R$%.2f'))
+    ax.grid(True, linestyle='--', alpha=0.7)
+    fig.tight_layout()
+    return fig
+
+# Function to plot expense distribution by category (Pie Chart) from the monthly cube
+def plot_expense_distribution_pie(cube):
+    # Expense totals per category
+    gastos_por_categoria = category_totals(cube, 'Expense')
+
+    # Handle cases where gastos_por_categoria might be empty after filtering
+    if gastos_por_categoria.empty:
+        return None
+
+    # Sort values for better visualization
+    gastos_por_categoria = gastos_por_categoria.sort_values(ascending=False)
+
+    fig = Figure(figsize=(6, 6)) # Reduced figure size for pie chart
+    ax = fig.subplots()
+    # Plot pie chart
+    wedges, texts, autotexts = ax.pie(gastos_por_categoria,
+                                      labels=gastos_por_categoria.index,
+                                      autopct='%1.1f%%', # Show percentages
+                                      startangle=140,
+                                      colors=mpl.colormaps['viridis'](gastos_por_categoria / gastos_por_categoria.max())) # Use a color map
+
+
+    ax.set_title('Distribuição de Despesas por Categoria (Percentual)', fontsize=14, color='white') # Adjusted font size and color
+    ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
+    fig.tight_layout()
+    return fig
+
+# Function to plot expense distribution by category (Bar Chart - total values) from the monthly cube
+def plot_expense_distribution_bar(cube):
+    gastos = category_totals(cube, 'Expense').sort_values(ascending=False)
+
+    # Handle cases where gastos might be empty after filtering
+    if gastos.empty:
+        return None
+
+
+    fig = Figure(figsize=(10, 6)) # Standardized figure size
+    ax = fig.subplots()
+    gastos.plot(kind='barh', ax=ax, color='#FFB74D') # Changed color
+    ax.set_title('Distribuição de Despesas por Categoria (Valores)', fontsize=14, color='white') # Adjusted font size and color
+    ax.set_xlabel('Valor (R$)', fontsize=10, color='white') # Adjusted font size and color
+    ax.set_ylabel('Categoria', fontsize=10, color='white') # Adjusted font size and color
+    ax.xaxis.set_major_formatter(mticker.FormatStrFormatter('R$%.2f'))
+    ax.grid(axis='x', linestyle='--', alpha=0.7)
+    fig.tight_layout()
+    return fig
+
+
+# Function to plot monthly expense evolution by category (Bar Chart) from the monthly cube
+def plot_monthly_category_expenses(cube):
+    monthly_category_expenses = monthly_category_totals(cube, 'Expense')
+
+    # Handle cases where monthly_category_expenses might be empty after filtering
+    if monthly_category_expenses.empty:
+         return None
+
+
+    fig = Figure(figsize=(12, 6)) # Standardized figure size
+    ax = fig.subplots()
+    monthly_category_expenses.plot(kind='bar', stacked=True, ax=ax, cmap='tab20') # Changed color map
+    ax.set_title('Evolução Mensal das Despesas por Categoria', fontsize=14, color='white') # Adjusted font size and color
+    ax.set_ylabel('Valor (R$)', fontsize=10, color='white') # Adjusted font size and color
+    ax.set_xlabel('Mês', fontsize=10, color='white') # Adjusted font size and color
+    _rotate_xticks(ax)
+    ax.yaxis.set_major_formatter(mticker.FormatStrFormatter('R$%.2f'))
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+    ax.legend(title='Categoria', bbox_to_anchor=(1.05, 1), loc='upper left', fontsize=8, facecolor='#262730', edgecolor='white') # Adjusted legend colors
+    fig.tight_layout()
+    return fig
+
+# Function to plot monthly income evolution from the monthly cube
+def plot_monthly_income(cube):
+    monthly_income = monthly_totals(cube, 'Income')
+
+    # Handle cases where monthly_income might be empty after filtering
+    if monthly_income.empty:
+        return None
+
+
+    fig = Figure(figsize=(10, 5)) # Standardized figure size
+    ax = fig.subplots()
+    monthly_income.plot(ax=ax, color='#4CAF50') # Changed color
+    ax.set_title('Evolução Mensal da Receita', fontsize=14, color='white') # Adjusted title color
+    ax.set_ylabel('Valor (R$)', fontsize=10, color='white') # Adjusted font size and color
+    ax.set_xlabel('Mês', fontsize=10, color='white') # Adjusted font size and color
+    ax.yaxis.set_major_formatter(mticker.FormatStrFormatter('R$%.2f'))
+    ax.grid(True, linestyle='--', alpha=0.7)
+    fig.tight_layout()
+    return fig
+
+# Function to plot cumulative savings per day (see ledger.PrefixSums.cumulative)
+def plot_cumulative_savings(cumulative_savings):
+    # Handle cases where cumulative_savings might be empty after filtering
+    if cumulative_savings.empty:
+        return None
+
+    fig = Figure(figsize=(10, 5)) # Standardized figure size
+    ax = fig.subplots()
+    cumulative_savings.plot(ax=ax, color='#2196F3') # Using a distinct color for savings
+    ax.set_title('Economias Acumuladas ao Longo do Tempo', fontsize=14, color='white') # Adjusted title color
+    ax.set_ylabel('Economias (R$)', fontsize=10, color='white') # Adjusted font size and color
+    ax.set_xlabel('Data', fontsize=10, color='white') # Adjusted font size and color
+    ax.yaxis.set_major_formatter(mticker.FormatStrFormatter('R$%.2f'))
+    ax.grid(True, linestyle='--', alpha=0.7)
+    fig.tight_layout()
+    return fig
+
+
+# Chart id -> plot function
+CHARTS = {
+    'monthly_cashflow': plot_monthly_cashflow,
+    'monthly_income': plot_monthly_income,
+    'expense_distribution_bar': plot_expense_distribution_bar,
+    'expense_distribution_pie': plot_expense_distribution_pie,
+    'cumulative_balance': plot_cumulative_balance,
+    'cumulative_savings': plot_cumulative_savings,
+    'monthly_category_expenses': plot_monthly_category_expenses,
+}
@@ -0,0 +1,116 @@
+# Hot-path instrumentation for the dashboard: per-stage timings, optional profiling and
+# structured (one JSON object per line) log records. Kept free of Streamlit, like ledger.py.
+#
+# Profiling is requested with the DASHBOARD_PROFILE environment variable or the ?profile=
+# query parameter ('1' or 'cprofile' for cProfile, 'pyinstrument' when it is installed).
+# Stage records are logged at INFO on the 'financial_app' logger; set DASHBOARD_LOG_LEVEL=INFO
+# to emit them.
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger('financial_app')
+
+PROFILE_ENV = 'DASHBOARD_PROFILE'
+DIAGNOSTICS_ENV = 'DASHBOARD_DIAGNOSTICS'
+LOG_LEVEL_ENV = 'DASHBOARD_LOG_LEVEL'
+
+
+# Send the app's records to stderr as bare JSON lines, once per process
+def configure_logging():
+    if logger.handlers:
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(os.environ.get(LOG_LEVEL_ENV, 'WARNING').upper())
+    logger.propagate = False
+
+
+def log_event(event, **fields):
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({'event': event, 'ts': time.time(), **fields}, ensure_ascii=False, default=str))
+
+
+# Wall-clock time of each stage of one rerun. Stages are recorded either by wrapping a
+# block in stage() or by lap(), which closes the stage running since the previous record.
+class StageTimer:
+    def __init__(self, run_id=None):
+        self.run_id = run_id
+        self.stages = [] # [(stage, seconds)] in the order they were recorded
+        self._start = self._last = time.perf_counter()
+
+    def add(self, stage, seconds):
+        self.stages.append((stage, seconds))
+        log_event('stage', run=self.run_id, stage=stage, ms=round(seconds * 1e3, 3))
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.add(stage, now - self._last)
+        self._last = now
+
+    @contextmanager
+    def stage(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._last = time.perf_counter()
+            self.add(stage, self._last - start)
+
+    def total(self):
+        return time.perf_counter() - self._start
+
+
+# Profiler of one rerun, started and stopped around the code to profile
+class Profiler:
+    def __init__(self, kind='cprofile'):
+        self.kind = kind
+        if kind == 'pyinstrument':
+            import pyinstrument # Optional; only needed when this profiler is requested
+            self._profiler = pyinstrument.Profiler()
+        else:
+            self._profiler = cProfile.Profile()
+
+    # Profiler asked for by `value` (query parameter) or the environment, or None
+    @classmethod
+    def requested(cls, value=None):
+        value = (value or os.environ.get(PROFILE_ENV, '')).lower()
+        if value in ('', '0', 'false', 'no'):
+            return None
+        if value == 'pyinstrument':
+            try:
+                return cls('pyinstrument')
+            except ImportError:
+                logger.warning('pyinstrument is not installed; profiling with cProfile')
+        return cls('cprofile')
+
+    def start(self):
+        if self.kind == 'pyinstrument':
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+
+    def stop(self):
+        if self.kind == 'pyinstrument':
+            self._profiler.stop()
+        else:
+            self._profiler.disable()
+
+    # Text report: the `limit` most expensive functions by cumulative time
+    def report(self, limit=30):
+        if self.kind == 'pyinstrument':
+            return self._profiler.output_text()
+        out = io.StringIO()
+        pstats.Stats(self._profiler, stream=out).sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
+
+
+# Diagnostics were asked for by `value` (query parameter) or the environment
+def diagnostics_requested(value=None):
+    return (value or os.environ.get(DIAGNOSTICS_ENV, '')).lower() in ('1', 'true', 'yes')
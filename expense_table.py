@@ -0,0 +1,120 @@
+# Server-side paging, sorting and search for the expense table, so a rerun sends the
+# browser one page of rows instead of every expense in the selected period.
+#
+# TextIndex is an inverted index over the categorical text columns, built once per
+# snapshot. Each column's distinct values map to the rows that hold them (posting lists),
+# and a trigram index over those values narrows a substring search to candidate values
+# before checking them. A search therefore looks up matching values, then reads only their
+# rows, with no scan over the rows' strings. Sorting uses precomputed ranks of the values,
+# and only the rows of the requested page are gathered from the ledger.
+import threading
+import weakref
+
+import numpy as np
+
+PAGE_SIZE = 50
+
+SEARCH_COLUMNS = ['Descrição', 'Categoria']
+
+# Columns the table can be sorted by
+SORT_COLUMNS = ['Data', 'Descrição', 'Categoria', 'Valor']
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+# Posting lists and trigrams for one categorical column
+class _ColumnIndex:
+    def __init__(self, column):
+        self.codes = column.cat.codes.to_numpy()
+        self.values = [str(value).casefold() for value in column.cat.categories]
+        n_values = len(self.values)
+
+        # Rows grouped by code, in row order within each code; rows of code c are
+        # rows[bounds[c]:bounds[c + 1]]. Blank cells (code -1) sort first and are skipped.
+        self.rows = np.argsort(self.codes, kind='stable')
+        self.bounds = np.searchsorted(self.codes[self.rows], np.arange(n_values + 1))
+
+        # Alphabetical rank of each code; the extra last slot ranks blank cells (code -1) last
+        self.rank = np.empty(n_values + 1, dtype=np.int64)
+        self.rank[column.cat.categories.argsort()] = np.arange(n_values)
+        self.rank[-1] = n_values
+
+        self.trigrams = {}
+        for code, value in enumerate(self.values):
+            for trigram in _trigrams(value):
+                self.trigrams.setdefault(trigram, []).append(code)
+
+    # Codes of the values containing `text` (already casefolded)
+    def match(self, text):
+        if len(text) < 3:
+            candidates = range(len(self.values))
+        else:
+            postings = [self.trigrams.get(trigram, ()) for trigram in _trigrams(text)]
+            candidates = set.intersection(*map(set, postings))
+        return [code for code in candidates if text in self.values[code]]
+
+    def rows_of(self, codes):
+        return [self.rows[self.bounds[code]:self.bounds[code + 1]] for code in codes]
+
+
+class TextIndex:
+    def __init__(self, df):
+        self.columns = {column: _ColumnIndex(df[column]) for column in SEARCH_COLUMNS}
+        self.valor = df['Valor'].to_numpy()
+
+    # Sorted positions (into the snapshot's ledger) of the rows where any search column
+    # contains `text`, ignoring case
+    def search(self, text):
+        text = text.casefold()
+        parts = [rows for index in self.columns.values() for rows in index.rows_of(index.match(text))]
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(parts))
+
+    # Sort key of `rows` for `column`; the ledger is sorted by Data, so for Data the row
+    # positions themselves are the key
+    def sort_key(self, column, rows):
+        if column == 'Data':
+            return rows
+        if column == 'Valor':
+            return self.valor[rows]
+        index = self.columns[column]
+        return index.rank[index.codes[rows]]
+
+
+_indexes = weakref.WeakKeyDictionary() # snapshot -> TextIndex, dropped with the snapshot
+_indexes_lock = threading.Lock()
+
+
+# TextIndex over `snapshot`, built once per snapshot
+def get_text_index(snapshot):
+    with _indexes_lock:
+        if snapshot not in _indexes:
+            _indexes[snapshot] = TextIndex(snapshot.df)
+        return _indexes[snapshot]
+
+
+# `rows` (sorted ledger positions, e.g. a period's expenses) restricted to those matching
+# `text` and ordered by `sort`. A search reads only the matching rows: their positions are
+# looked up in `rows` by binary search instead of scanning `rows`.
+def select_rows(index, rows, text='', sort='Data', ascending=True):
+    if text:
+        matches = index.search(text)
+        found = np.searchsorted(rows, matches).clip(max=max(len(rows) - 1, 0))
+        rows = matches[rows[found] == matches] if len(rows) else rows
+    if sort == 'Data' and ascending:
+        return rows # Already in Data order
+    key = index.sort_key(sort, rows)
+    return rows[np.argsort(key if ascending else -key, kind='stable')]
+
+
+def page_count(n_rows, page_size=PAGE_SIZE):
+    return max(1, -(-n_rows // page_size))
+
+
+# Rows of page `page` (1-based) of `rows`, gathered from the ledger for `columns` only
+def page_rows(df, rows, page, columns, page_size=PAGE_SIZE):
+    start = (page - 1) * page_size
+    return df.iloc[rows[start:start + page_size]][columns].reset_index(drop=True)
@@ -0,0 +1,177 @@
+# Cash-flow projection from the ledger's recurring transactions.
+#
+# A recurring series is one (Descrição, Tipo, Frequência) among the rows flagged in
+# Recorrente, still active at the end of the ledger: seen within its last period. Each
+# series repeats its latest value every period (Mensal: 1 month, Anual: 12) from its last
+# occurrence. The installment columns are not used: the workbook fills them in
+# inconsistently (the salary is marked as installment 1 of 12), so series are projected
+# as open-ended.
+#
+# Every month of the horizon is projected at once: a series x month occurrence matrix
+# times the series' values gives the base monthly totals per Tipo. What-if scenarios
+# (SCENARIOS: a % change per Tipo plus an annual inflation rate on expenses) then
+# rescale those totals as one broadcast over scenarios x months x Tipo. Results are
+# cached per snapshot, horizon and scenario set (get_forecast). Only each series' latest
+# occurrence matters, so for several accounts the forecast is built from the latest
+# occurrences stored with each account's partitions (PartitionCatalog.forecast) instead
+# of from their rows.
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+MIN_HORIZON = 12
+MAX_HORIZON = 60
+DEFAULT_HORIZON = 12
+
+TIPOS = ['Income', 'Expense', 'Savings']
+
+# Months between occurrences per Frequência (lowercased); others (Unica) don't recur
+FREQUENCY_MONTHS = {'mensal': 1, 'anual': 12}
+
+RECURRING_FLAGS = {'y', 's', 'sim', 'yes'}
+
+# Columns identifying a recurring series
+SERIES_KEYS = ['Descrição', 'Tipo', 'Frequência']
+
+# What-if scenarios: % change of each Tipo's recurring values and annual inflation (%)
+# compounded monthly on expenses
+SCENARIOS = {
+    'Base': {'Income': 0, 'Expense': 0, 'Savings': 0, 'inflation': 0},
+    'Receita -10%': {'Income': -10, 'Expense': 0, 'Savings': 0, 'inflation': 0},
+    'Despesas +10%': {'Income': 0, 'Expense': 10, 'Savings': 0, 'inflation': 0},
+    'Inflação 5% a.a.': {'Income': 0, 'Expense': 0, 'Savings': 0, 'inflation': 5},
+    'Economias +20%': {'Income': 0, 'Expense': 0, 'Savings': 20, 'inflation': 0},
+}
+DEFAULT_SCENARIOS = ('Base',)
+
+
+# Ordinal of the ledger's last month with data, or None (rows without a date sort last)
+def last_month(df):
+    months = df['AnoMes'].array.asi8[df['Data'].notna().to_numpy()]
+    return int(months[-1]) if len(months) else None
+
+
+# Latest occurrence of every recurring series of `df`, one row each: Descrição, Tipo,
+# Frequência, Data, period (months), last (month ordinal) and Valor. Small, so it is also
+# stored per account with the partitions (see partitions.py).
+def latest_occurrences(df):
+    if 'Recorrente' not in df.columns or 'Frequência' not in df.columns:
+        return pd.DataFrame({'Descrição': [], 'Tipo': [], 'Frequência': [], 'Data': pd.to_datetime([]),
+                             'period': np.empty(0, np.int64), 'last': np.empty(0, np.int64), 'Valor': []})
+    # Flags and frequencies are categoricals: normalize their few distinct values, not every row
+    recurring = df['Recorrente'].cat.categories.str.strip().str.lower().isin(RECURRING_FLAGS)
+    flagged = np.isin(df['Recorrente'].cat.codes.to_numpy(), np.flatnonzero(recurring))
+    periods = df['Frequência'].cat.categories.str.strip().str.lower().map(FREQUENCY_MONTHS)
+    period = np.append(np.asarray(periods, dtype=np.float64), np.nan)[df['Frequência'].cat.codes.to_numpy()]
+    rows = flagged & ~np.isnan(period) & df['Data'].notna().to_numpy()
+
+    recurring_rows = df.loc[rows, SERIES_KEYS + ['Data', 'AnoMes', 'Valor']].assign(period=period[rows])
+    # The ledger is sorted by Data, so each series' last row is its latest occurrence
+    latest = recurring_rows.groupby(SERIES_KEYS, observed=True, sort=False).tail(1)
+    return pd.DataFrame({
+        **{key: latest[key].astype(str).to_numpy() for key in SERIES_KEYS},
+        'Data': latest['Data'].to_numpy(),
+        'period': latest['period'].to_numpy(np.int64),
+        'last': latest['AnoMes'].array.asi8,
+        'Valor': latest['Valor'].to_numpy(np.float64),
+    })
+
+
+# Latest occurrences of several ledgers (latest_occurrences of each) as those of one ledger
+# holding all their rows sorted by Data, same-day rows in the order of `frames`
+def combine_occurrences(frames):
+    occurrences = pd.concat(frames, ignore_index=True).sort_values('Data', kind='stable')
+    return occurrences.groupby(SERIES_KEYS, sort=False).tail(1).reset_index(drop=True)
+
+
+# One row per series of `occurrences` still active at month `end` (an ordinal): seen
+# within its last period. Columns: Tipo, period (months), last (month ordinal), Valor
+def active_series(occurrences, end):
+    series = occurrences[['Tipo', 'period', 'last', 'Valor']]
+    if end is None:
+        return series.iloc[:0].reset_index(drop=True)
+    return series[(series['last'] >= end - series['period']) & series['Tipo'].isin(TIPOS)].reset_index(drop=True)
+
+
+# One row per active recurring series of `df` (see active_series)
+def recurring_series(df):
+    return active_series(latest_occurrences(df), last_month(df))
+
+
+# (months, H x Tipo base totals) of `series` over the `horizon` months after month `end`
+def project(series, end, horizon):
+    months = end + np.arange(1, horizon + 1)
+    since_last = months[None, :] - series['last'].to_numpy()[:, None]
+    occurs = since_last % series['period'].to_numpy()[:, None] == 0 # series x month
+    tipo = (series['Tipo'].to_numpy()[:, None] == np.array(TIPOS)[None, :]) # series x Tipo one-hot
+    totals = occurs.T.astype(np.float64) @ (tipo * series['Valor'].to_numpy()[:, None])
+    return pd.PeriodIndex.from_ordinals(months, freq='M'), totals
+
+
+# Scenario x month x Tipo totals: the base totals rescaled by every scenario in one pass
+def apply_scenarios(totals, scenarios):
+    params = pd.DataFrame([SCENARIOS[name] for name in scenarios])
+    change = 1 + params[TIPOS].to_numpy(np.float64) / 100 # scenario x Tipo
+    years = np.arange(1, totals.shape[0] + 1) / 12
+    inflation = (1 + params['inflation'].to_numpy(np.float64)[:, None] / 100) ** years[None, :] # scenario x month
+    growth = np.ones((len(scenarios), totals.shape[0], len(TIPOS)))
+    growth[:, :, TIPOS.index('Expense')] = inflation
+    return totals[None, :, :] * change[:, None, :] * growth
+
+
+# Projection of `series` (see active_series) from the month after `end`, the ledger's last
+# month (an ordinal; None for an empty ledger, projected from the current month)
+class Forecast:
+    def __init__(self, series, end, horizon=DEFAULT_HORIZON, scenarios=DEFAULT_SCENARIOS):
+        self.horizon = horizon
+        self.scenarios = list(scenarios)
+        self.series = series
+        end = pd.Period.now('M').ordinal if end is None else end
+        self.months, base = project(self.series, end, horizon)
+        self.totals = apply_scenarios(base, self.scenarios) # scenario x month x Tipo
+        signs = np.where(np.array(TIPOS) == 'Income', 1.0, -1.0)
+        self.net = self.totals @ signs # scenario x month
+
+    # Income, Expense, Savings and Net per projected month for one scenario
+    def monthly(self, scenario):
+        i = self.scenarios.index(scenario)
+        table = pd.DataFrame(self.totals[i], index=pd.PeriodIndex(self.months, name='AnoMes'), columns=TIPOS)
+        table['Net'] = self.net[i]
+        return table
+
+    # Projected cumulative balance per scenario (columns), starting from `start_value` on
+    # `start_date` and stepping at the end of each projected month
+    def balance(self, start_date, start_value):
+        dates = pd.DatetimeIndex([pd.Timestamp(start_date)]).append(self.months.to_timestamp(how='end').normalize())
+        values = start_value + np.cumsum(np.column_stack([np.zeros(len(self.scenarios)), self.net]), axis=1)
+        return pd.DataFrame(values.T, index=dates.rename('Data'), columns=self.scenarios)
+
+
+# Frame of the cumulative balance `saldo` ('Saldo') plus each scenario of `forecast`
+# continuing from its last value, the input of the cumulative balance charts
+def extend_balance(saldo, forecast):
+    if saldo.empty:
+        return saldo
+    projection = forecast.balance(saldo.index[-1], saldo.iloc[-1])
+    return saldo.rename('Saldo').to_frame().join(projection, how='outer')
+
+
+_forecasts = weakref.WeakKeyDictionary() # snapshot -> {(horizon, scenarios): Forecast}
+_forecasts_lock = threading.Lock()
+
+
+# (horizon within the slider's bounds, scenarios as a tuple): the key of a cached forecast
+def forecast_key(horizon, scenarios):
+    return int(min(max(horizon, MIN_HORIZON), MAX_HORIZON)), tuple(scenarios)
+
+
+# Forecast of `snapshot`, built once per snapshot, horizon and scenario set
+def get_forecast(snapshot, horizon=DEFAULT_HORIZON, scenarios=DEFAULT_SCENARIOS):
+    key = forecast_key(horizon, scenarios)
+    with _forecasts_lock:
+        per_snapshot = _forecasts.setdefault(snapshot, {})
+        if key not in per_snapshot:
+            per_snapshot[key] = Forecast(recurring_series(snapshot.df), last_month(snapshot.df), *key)
+        return per_snapshot[key]
@@ -0,0 +1,422 @@
+# Ledger preparation and financial computations, kept free of Streamlit so they can
+# be reused outside the dashboard.
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+
+# Text columns stored as categoricals: a small dictionary of distinct values plus integer
+# codes per row, so equality filters compare codes and repeated descriptions are interned
+CATEGORICAL_COLUMNS = ['Tipo', 'Categoria', 'Descrição', 'Recorrente', 'Frequência', 'Conta']
+
+# Installment counts are small whole numbers (NaN when blank), so float32 is plenty
+COMPACT_NUMERIC_COLUMNS = ['Nº Parcelas', 'Parcela Atual']
+
+
+# Derive every computed column in one vectorized pass:
+#   AnoMes        - monthly period of the transaction
+#   AnoMes_dt     - first day of that month as a timestamp (used by the month pickers)
+#   Valor_signed  - Income is positive, Expense and Savings are negative
+# Text columns become categoricals and installment counts are downcast (see above); Valor
+# stays float64 so sums of money don't lose cents.
+# Rows are sorted by Data (stable, so same-day rows keep their workbook order) so date
+# filters can be resolved with a binary search; see slice_dates.
+def prepare_ledger(df):
+    df = df.sort_values('Data', kind='stable', ignore_index=True)
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    for column in COMPACT_NUMERIC_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('float32')
+    period = df['Data'].dt.to_period('M')
+
+    df['AnoMes'] = period
+    df['AnoMes_dt'] = period.dt.to_timestamp()
+    df['Valor_signed'] = np.where(df['Tipo'] == 'Income', df['Valor'], -df['Valor'])
+    return df
+
+
+# Tipo -> boolean row mask over the whole prepared ledger, from the category codes
+def build_tipo_masks(df):
+    codes = df['Tipo'].cat.codes.to_numpy()
+    return {tipo: codes == code for code, tipo in enumerate(df['Tipo'].cat.categories)}
+
+
+# Month -> [start, stop) row offsets into the sorted ledger
+def build_month_offsets(df):
+    months = df['AnoMes'].drop_duplicates()
+    starts = months.index.to_numpy()
+    stops = np.append(starts[1:], len(df))
+    return pd.DataFrame({'start': starts, 'stop': stops}, index=pd.PeriodIndex(months, name='AnoMes'))
+
+
+# Pre-aggregate the ledger per day: (Data, Tipo) -> Valor (the day's total) and rows (how
+# many transactions), the input of PrefixSums
+def build_daily_totals(df):
+    return df.groupby(['Data', 'Tipo'], observed=True)['Valor'].agg(Valor='sum', rows='size')
+
+
+# Totals read off running totals carry float error (a month of 6569.5 may come out as
+# 6569.499999999, or an unchanged month as a -1e-12 change); money has cents, so it is
+# rounded away, -0.0 included
+def _settle(values):
+    return np.round(values, 6) + 0.0
+
+
+# Daily running totals per Tipo, plus 'Net' (the signed balance, Income positive), built
+# once per snapshot from its daily totals. Row i of `sums` holds the totals of every day
+# before days[i], so the total over the days [lo, hi) is sums[hi] - sums[lo]. Date filters
+# become day bounds found by binary search: a list of [lo, hi) segments, one per
+# contiguous range. Range totals, opening balances and monthly totals are then lookups at
+# those bounds and at the month edges, and the cumulative charts are slices of `sums`
+# instead of a fresh groupby().cumsum().
+class PrefixSums:
+    def __init__(self, daily):
+        totals = daily['Valor'].unstack('Tipo', fill_value=0)
+        counts = daily['rows'].unstack('Tipo', fill_value=0).reindex(columns=totals.columns)
+        signs = np.where(totals.columns == 'Income', 1.0, -1.0)
+        values = totals.to_numpy(dtype=np.float64)
+
+        self.days = totals.index
+        self.keys = {key: i for i, key in enumerate(list(totals.columns) + ['Net'])}
+        self.sums = np.vstack([np.zeros((1, len(self.keys))),
+                               np.cumsum(np.column_stack([values, values @ signs]), axis=0)])
+        # Days on which each key has rows; every day has a Net entry. `active_sums` counts
+        # them the way `sums` adds up values.
+        self.active = np.column_stack([counts.to_numpy() > 0, np.ones(len(self.days), dtype=bool)])
+        self.active_sums = np.vstack([np.zeros((1, len(self.keys)), dtype=np.int64), np.cumsum(self.active, axis=0)])
+
+        months = self.days.to_period('M')
+        starts = np.flatnonzero(np.append(len(months) > 0, months[1:] != months[:-1]))
+        self.months = pd.PeriodIndex(months[starts], name='AnoMes')
+        self.month_edges = np.append(starts, len(self.days)) # Month i spans days [edges[i], edges[i + 1])
+
+    # (running totals, active days) of one key; all zeros for a Tipo the ledger lacks
+    def _column(self, key):
+        i = self.keys.get(key)
+        if i is None:
+            return np.zeros(len(self.days) + 1), np.zeros(len(self.days), dtype=bool)
+        return self.sums[:, i], self.active[:, i]
+
+    # [(lo, hi)] day bounds of the inclusive date range; the whole ledger by default
+    def range_bounds(self, start=None, end=None):
+        lo = 0 if start is None else self.days.searchsorted(pd.Timestamp(start).normalize())
+        hi = len(self.days) if end is None else self.days.searchsorted(pd.Timestamp(end).normalize() + pd.Timedelta(days=1))
+        return [(int(lo), int(max(lo, hi)))]
+
+    # [(lo, hi)] day bounds of each of `months` with data, in order
+    def month_bounds(self, months):
+        positions = self.months.get_indexer(sorted(set(months)))
+        return [(int(self.month_edges[i]), int(self.month_edges[i + 1])) for i in positions[positions >= 0]]
+
+    # Total of `key` (a Tipo, or 'Net') over the segments in `bounds`
+    def total(self, key, bounds):
+        sums = self._column(key)[0]
+        return float(_settle(sum(sums[hi] - sums[lo] for lo, hi in bounds)))
+
+    # Running total of `key` before the first segment, e.g. the balance a period opens with
+    def opening(self, key, bounds):
+        return float(_settle(self._column(key)[0][bounds[0][0]])) if bounds else 0.0
+
+    # [start, stop) day bounds and month of each month's part of the segments in `bounds`
+    # (the whole ledger by default); only months with rows of some Tipo are included
+    def _month_parts(self, bounds):
+        starts, stops = [], []
+        for lo, hi in self.range_bounds() if bounds is None else bounds:
+            inner = self.month_edges[(self.month_edges > lo) & (self.month_edges < hi)]
+            starts.append(np.append(lo, inner))
+            stops.append(np.append(inner, hi))
+        starts = np.concatenate(starts) if starts else np.empty(0, dtype=np.int64)
+        stops = np.concatenate(stops) if stops else np.empty(0, dtype=np.int64)
+        starts, stops = starts[stops > starts], stops[stops > starts]
+        months = self.months[self.month_edges.searchsorted(starts, side='right') - 1]
+        return starts, stops, pd.PeriodIndex(months, name='AnoMes')
+
+    # Totals of `key` per month within `bounds`, only for the months in which it has rows
+    def monthly(self, key, bounds=None):
+        starts, stops, months = self._month_parts(bounds)
+        i = self.keys.get(key)
+        if i is None:
+            return pd.Series(np.empty(0), index=months[:0], name=key)
+        present = self.active_sums[stops, i] > self.active_sums[starts, i]
+        return pd.Series(_settle(self.sums[stops[present], i] - self.sums[starts[present], i]), index=months[present], name=key)
+
+    # Month-over-month change of `key` within `bounds`, over every month with rows (`key`
+    # counting 0 where it has none); the first month's change is 0
+    def month_deltas(self, key, bounds=None):
+        starts, stops, months = self._month_parts(bounds)
+        sums = self._column(key)[0]
+        totals = _settle(sums[stops] - sums[starts])
+        return pd.Series(_settle(np.diff(totals, prepend=totals[:1])), index=months, name=key)
+
+    # Running balance (Net) on the days of `bounds`, continuing from the balance before them
+    def balance(self, bounds):
+        return self.cumulative('Net', bounds) + self.opening('Net', bounds)
+
+    # Cumulative `key` over the segments in `bounds`, starting from zero, on the days `key`
+    # has rows; segments follow on from each other as if the gaps between them were absent
+    def cumulative(self, key, bounds):
+        sums, active = self._column(key)
+        positions, values, carried = [], [], 0.0
+        for lo, hi in bounds:
+            days = lo + np.flatnonzero(active[lo:hi])
+            positions.append(days)
+            values.append(sums[days + 1] - sums[lo] + carried)
+            carried += sums[hi] - sums[lo]
+        if not positions:
+            return pd.Series(np.empty(0), index=self.days[:0], name=key)
+        positions = positions[0] if len(positions) == 1 else np.concatenate(positions)
+        return pd.Series(values[0] if len(values) == 1 else np.concatenate(values), index=self.days[positions], name=key)
+
+
+# Rows of the sorted ledger whose Data falls in the inclusive date range, as a slice
+# found by binary search rather than a scan of every row
+def slice_dates(df, start, end):
+    start = pd.Timestamp(start).normalize()
+    end = pd.Timestamp(end).normalize() + pd.Timedelta(days=1)
+    lo, hi = df['Data'].searchsorted([start, end])
+    return df.iloc[lo:hi]
+
+
+# Rows of the sorted ledger in the given months, using the month offset table
+def slice_months(df, offsets, months):
+    positions = offsets.index.get_indexer(sorted(set(months)))
+    positions = positions[positions >= 0]
+    starts = offsets['start'].to_numpy()[positions]
+    stops = offsets['stop'].to_numpy()[positions]
+    if len(positions) == 1:
+        return df.iloc[starts[0]:stops[0]]
+    return pd.concat([df.iloc[start:stop] for start, stop in zip(starts, stops)] or [df.iloc[:0]])
+
+
+# Date-filtered view over the prepared ledger. `df` is a slice of the sorted ledger and
+# per-Tipo subsets are resolved lazily as row-position arrays, so column data is only
+# gathered for the columns a caller asks for, instead of copying the whole frame once
+# per chart. `masks` are the whole ledger's per-Tipo masks (see build_tipo_masks); the
+# ledger has a RangeIndex, so a view's index labels are its row positions in them.
+class FilteredLedger:
+    def __init__(self, df, masks=None):
+        self.df = df
+        self.masks = masks
+        self._positions = {}
+
+    def __len__(self):
+        return len(self.df)
+
+    @property
+    def empty(self):
+        return self.df.empty
+
+    # Row positions (into self.df) of the given Tipo, computed once per view
+    def positions(self, tipo):
+        if tipo not in self._positions:
+            self._positions[tipo] = np.flatnonzero(self._mask(tipo))
+        return self._positions[tipo]
+
+    def _mask(self, tipo):
+        if self.masks is None:
+            categories = self.df['Tipo'].cat.categories
+            code = categories.get_loc(tipo) if tipo in categories else -2
+            return self.df['Tipo'].cat.codes.to_numpy() == code
+        mask = self.masks.get(tipo)
+        if mask is None:
+            return np.zeros(len(self.df), dtype=bool)
+        index = self.df.index
+        if isinstance(index, pd.RangeIndex) and index.step == 1:
+            return mask[index.start:index.stop] # Contiguous slice: no gather needed
+        return mask[index.to_numpy()]
+
+    # Positions of one Tipo's rows in the whole ledger (the view's index labels), sorted
+    def ledger_positions(self, tipo):
+        return self.df.index.to_numpy()[self.positions(tipo)]
+
+    # Rows of one Tipo, restricted to `columns` when given
+    def tipo(self, tipo, columns=None):
+        frame = self.df if columns is None else self.df[columns]
+        return frame.iloc[self.positions(tipo)]
+
+
+# Pre-aggregate the ledger into a (AnoMes, Tipo, Categoria) -> Valor series. Monthly
+# summaries, charts and category boxes are sliced from this cube instead of rescanning
+# the raw transactions.
+def build_monthly_cube(df):
+    return df.groupby(['AnoMes', 'Tipo', 'Categoria'], observed=True)['Valor'].sum()
+
+
+# Restrict the cube to the given months
+def cube_months(cube, months):
+    return cube[cube.index.get_level_values('AnoMes').isin(months)]
+
+
+# Cube for an inclusive date range. Months entirely inside the range come straight from
+# the cube; only the partial months at the edges are re-aggregated from raw rows.
+def cube_for_range(df, cube, start, end):
+    start = pd.Timestamp(start).normalize()
+    end = pd.Timestamp(end).normalize()
+    first, last = start.to_period('M'), end.to_period('M')
+    inner_first = first if start == first.start_time else first + 1
+    inner_last = last if end == last.end_time.normalize() else last - 1
+
+    months = cube.index.get_level_values('AnoMes')
+    result = cube[(months >= inner_first) & (months <= inner_last)]
+
+    edge_months = sorted({m for m in (first, last) if not inner_first <= m <= inner_last})
+    if edge_months:
+        edge_rows = pd.concat([slice_dates(df, max(start, m.start_time), min(end, m.end_time)) for m in edge_months])
+        result = pd.concat([result, build_monthly_cube(edge_rows)]).sort_index()
+    return result
+
+
+def _tipo_mask(cube, tipo):
+    return cube.index.get_level_values('Tipo') == tipo
+
+
+# AnoMes x Tipo table of monthly totals
+def monthly_by_tipo(cube):
+    return cube.groupby(level=['AnoMes', 'Tipo'], observed=True).sum().unstack(fill_value=0)
+
+
+# Monthly totals for one Tipo, only for the months in which it occurs
+def monthly_totals(cube, tipo):
+    return cube[_tipo_mask(cube, tipo)].groupby(level='AnoMes').sum()
+
+
+# Totals per category for one Tipo, optionally for a single month
+def category_totals(cube, tipo, month=None):
+    mask = _tipo_mask(cube, tipo)
+    if month is not None:
+        mask &= cube.index.get_level_values('AnoMes') == month
+    return cube[mask].groupby(level='Categoria', observed=True).sum()
+
+
+# AnoMes x Categoria table of monthly totals for one Tipo
+def monthly_category_totals(cube, tipo):
+    return (cube[_tipo_mask(cube, tipo)]
+            .groupby(level=['AnoMes', 'Categoria'], observed=True)
+            .sum()
+            .unstack(fill_value=0))
+
+
+# Monthly Income, Expense and Savings totals and the net balance (Income minus Expense
+# minus Savings) over day bounds of a PrefixSums (the whole ledger by default), read at the
+# month edges. Each series only holds the months in which it occurs, so "last month" and
+# "previous month" are per series, as the dashboard has always shown them.
+class MonthlySummary:
+    KEYS = ['Income', 'Expense', 'Savings', 'Net']
+
+    def __init__(self, prefix_sums, bounds=None):
+        self.prefix_sums = prefix_sums
+        self.bounds = prefix_sums.range_bounds() if bounds is None else bounds
+        self.series = {key: prefix_sums.monthly(key, self.bounds) for key in self.KEYS}
+
+    # Totals over the whole of the bounds
+    def totals(self):
+        return {key: self.prefix_sums.total(key, self.bounds) for key in self.KEYS}
+
+    # Totals for one month (0 where a series has no data)
+    def month(self, month):
+        return {key: series.get(month, 0) for key, series in self.series.items()}
+
+    # (month2 total, month2 - month1) per series
+    def compare(self, month1, month2):
+        return {key: (series.get(month2, 0), series.get(month2, 0) - series.get(month1, 0))
+                for key, series in self.series.items()}
+
+    # (last month total, last - previous month) per series
+    def latest(self):
+        changes = {}
+        for key, series in self.series.items():
+            last = series.iloc[-1] if not series.empty else 0
+            prev = series.iloc[-2] if len(series) >= 2 else 0
+            changes[key] = (last, last - prev)
+        return changes
+
+    # AnoMes x (Income, Expense, Savings, Net) table plus month-over-month deltas
+    def table(self):
+        deltas = pd.DataFrame({f'{key} change': self.prefix_sums.month_deltas(key, self.bounds) for key in self.KEYS})
+        table = pd.DataFrame(self.series).reindex(index=deltas.index, columns=self.KEYS).fillna(0)
+        return pd.concat([table, deltas], axis=1)
+
+
+# Expense (or other Tipo) totals per category for two months side by side, with the change
+def category_comparison(cube, tipo, month1, month2):
+    table = pd.DataFrame({'month1': category_totals(cube, tipo, month1),
+                          'month2': category_totals(cube, tipo, month2)}).fillna(0)
+    table['change'] = table['month2'] - table['month1']
+    return table.sort_index()
+
+
+# Append `new` to `old` (both prepared) keeping the text columns categorical. New
+# categories are added after the existing ones so the codes already in `old` stay valid.
+def _concat_prepared(old, new):
+    old, new = old.copy(deep=False), new.copy(deep=False)
+    for column in CATEGORICAL_COLUMNS:
+        if column not in old.columns:
+            continue
+        added = new[column].cat.categories.difference(old[column].cat.categories)
+        old[column] = old[column].cat.add_categories(added)
+        new[column] = new[column].cat.set_categories(old[column].cat.categories)
+    return pd.concat([old, new], ignore_index=True)
+
+
+# Merge two series/frames indexed by an increasing key where `new` may start at the
+# last key of `old` (a day or month split across both); `combine` merges that row
+def _extend_sorted(old, new, combine):
+    if len(old) and len(new) and new.index[0] == old.index[-1]:
+        new = new.copy()
+        new.iloc[0] = combine(old.iloc[-1], new.iloc[0])
+        old = old.iloc[:-1]
+    return pd.concat([old, new])
+
+
+# Prepared ledger plus the derived structures the dashboard reads, for one data version.
+# A snapshot is shared by every session and must be treated as read-only: callers derive
+# new frames from it (copy-on-write keeps those from copying or touching the shared data)
+# and never modify it in place. A new version is a new snapshot (see append).
+class LedgerSnapshot:
+    def __init__(self, df, cube=None, month_offsets=None, daily=None):
+        self.df = df
+        self.cube = build_monthly_cube(df) if cube is None else cube
+        self.month_offsets = build_month_offsets(df) if month_offsets is None else month_offsets
+        self.daily = build_daily_totals(df) if daily is None else daily
+        self.tipo_masks = build_tipo_masks(df)
+        for mask in self.tipo_masks.values():
+            mask.flags.writeable = False
+        # Sidebar picker options, derived once per version instead of on every rerun
+        self.months = list(self.month_offsets.index.to_timestamp())
+        last = df['Data'].last_valid_index() # Rows without a date sort last
+        self.date_range = (df['Data'].iloc[0].date(), df['Data'].loc[last].date()) if last is not None else None
+        self.version = 0 # Assigned by the store that publishes the snapshot
+
+    # Daily running totals per Tipo (see PrefixSums), built on first use
+    @cached_property
+    def prefix_sums(self):
+        return PrefixSums(self.daily)
+
+    # Snapshot covering `months`; every month is already in memory, so this is the
+    # snapshot itself (partitions.AccountsView loads only the months asked for)
+    def for_months(self, months):
+        return self
+
+    # Snapshot with newly appended raw rows. Only the new rows are prepared and aggregated;
+    # the cube, month offsets and daily totals are extended instead of rebuilt. Returns
+    # None when the new rows are dated before the end of the ledger, or the ledger ends in
+    # undated rows (they sort last, so dated rows can't follow them), since keeping the
+    # ledger sorted by Data then requires a full prepare_ledger.
+    def append(self, new_rows):
+        new = prepare_ledger(new_rows)
+        if new.empty:
+            return self
+        if not self.df.empty:
+            last = self.df['Data'].iloc[-1]
+            if pd.isna(last) or new['Data'].iloc[0] < last:
+                return None
+
+        offset = len(self.df)
+        cube = self.cube.add(build_monthly_cube(new), fill_value=0).sort_index()
+        month_offsets = _extend_sorted(self.month_offsets, build_month_offsets(new) + offset,
+                                       lambda old, new: pd.Series({'start': old['start'], 'stop': new['stop']}))
+        daily = self.daily.add(build_daily_totals(new), fill_value=0).sort_index()
+        return LedgerSnapshot(_concat_prepared(self.df, new), cube, month_offsets, daily)
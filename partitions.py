@@ -0,0 +1,275 @@
+# Partitioned storage for many accounts.
+#
+# Each account's workbook is split into one Arrow file per month,
+#   <root>/<account>/<YYYY-MM>.arrow
+# next to that account's pre-aggregates: the monthly cube (cube.arrow) and the daily totals
+# per Tipo (daily.arrow), both keyed by month, and the latest occurrence of each recurring
+# series (recurring.arrow, see forecast.py). A catalog (<root>/catalog.json) records each
+# partition's row count, date bounds and content digest. Queries prune partitions by
+# account and month using the catalog alone, read only the partition files that survive,
+# and build cross-account aggregates from the pre-aggregates instead of raw rows.
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from forecast import Forecast, active_series, combine_occurrences, forecast_key, latest_occurrences
+from ledger import LedgerSnapshot, build_daily_totals, build_month_offsets, build_monthly_cube, prepare_ledger
+from storage import frame_digest, load_ledger, read_columnar, write_columnar
+
+PARTITION_DIR = '.ledger_partitions'
+
+# Layout of the partition files; a catalog written with another one is re-ingested
+CATALOG_FORMAT = 3
+
+# Pruned snapshots kept in memory, most recently used last
+SNAPSHOT_CACHE_SIZE = 16
+
+
+# {account: workbook path} from "Conta A=a.xlsx;Conta B=b.xlsx" (the LEDGER_ACCOUNTS format)
+def parse_accounts(text):
+    accounts = {}
+    for item in filter(None, (part.strip() for part in text.split(';'))):
+        name, _, path = item.partition('=')
+        accounts[name.strip()] = path.strip()
+    return accounts
+
+
+def _read_catalog(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_catalog(path, catalog):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(catalog, f)
+    os.replace(tmp, path) # Readers never see a half-written catalog
+
+
+def _month_keys(months):
+    return None if months is None else {str(pd.Period(month, 'M')) for month in months}
+
+
+# Pre-aggregates store months as period ordinals, which filter and convert back cheaply
+def _month_ordinals(keys):
+    return [pd.Period(key, 'M').ordinal for key in keys]
+
+
+class PartitionCatalog:
+    def __init__(self, root=PARTITION_DIR):
+        self.root = root
+        catalog = _read_catalog(self._catalog_path()) or {'version': 0}
+        if catalog.get('format') != CATALOG_FORMAT:
+            # Keep counting versions: they key the chart cache
+            catalog = {'format': CATALOG_FORMAT, 'version': catalog['version'], 'accounts': {}}
+        self.catalog = catalog
+        self._aggregates = {} # account -> (cube, daily, recurring frames), read on first use
+        self._snapshots = OrderedDict()
+        self._forecasts = {} # (accounts, horizon, scenarios) -> Forecast of the current version
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        return self.catalog['version']
+
+    def _catalog_path(self):
+        return os.path.join(self.root, 'catalog.json')
+
+    def _account_dir(self, account):
+        return os.path.join(self.root, account)
+
+    # Bring the partitions of every account in `sources` ({account: workbook path}) up to
+    # date. Only accounts whose workbook changed are re-read, and only months whose rows
+    # changed are rewritten. Returns True when anything changed.
+    def refresh(self, sources):
+        with self._lock:
+            changed = False
+            for account, path in sources.items():
+                entry = self.catalog['accounts'].get(account)
+                stat = os.stat(path)
+                if entry is not None and (entry['source'], entry['size'], entry['mtime_ns']) == (path, stat.st_size, stat.st_mtime_ns):
+                    continue
+                self._ingest(account, path, stat, entry)
+                changed = True
+            for account in set(self.catalog['accounts']) - set(sources):
+                del self.catalog['accounts'][account]
+                shutil.rmtree(self._account_dir(account), ignore_errors=True)
+                changed = True
+
+            if changed:
+                self.catalog['version'] += 1
+                _write_catalog(self._catalog_path(), self.catalog)
+                self._aggregates.clear()
+                self._snapshots.clear()
+                self._forecasts.clear()
+            return changed
+
+    def _ingest(self, account, path, stat, entry):
+        account_dir = self._account_dir(account)
+        raw = load_ledger(path, os.path.join(account_dir, 'source'))
+        raw = raw.sort_values('Data', kind='stable', ignore_index=True) # Same row order as prepare_ledger
+        prepared = prepare_ledger(raw.copy())
+        old_partitions = entry['partitions'] if entry is not None else {}
+
+        partitions = {}
+        offsets = build_month_offsets(prepared)
+        for month, start, stop in zip(offsets.index, offsets['start'], offsets['stop']):
+            if pd.isna(month):
+                continue # Rows without a date can't be selected by any date filter
+            key = str(month)
+            rows = raw.iloc[start:stop]
+            digest = frame_digest(rows)
+            if old_partitions.get(key, {}).get('digest') != digest:
+                write_columnar(rows, os.path.join(account_dir, key + '.arrow'))
+            partitions[key] = {
+                'rows': int(stop - start),
+                'first': rows['Data'].iloc[0].date().isoformat(),
+                'last': rows['Data'].iloc[-1].date().isoformat(),
+                'digest': digest,
+            }
+        for stale in set(old_partitions) - set(partitions):
+            os.remove(os.path.join(account_dir, stale + '.arrow'))
+
+        cube = build_monthly_cube(prepared).reset_index()
+        cube['AnoMes'] = cube['AnoMes'].array.asi8
+        cube[['Tipo', 'Categoria']] = cube[['Tipo', 'Categoria']].astype(str)
+        daily = build_daily_totals(prepared).reset_index()
+        daily['Tipo'] = daily['Tipo'].astype(str)
+        daily['AnoMes'] = daily['Data'].dt.to_period('M').array.asi8
+        write_columnar(cube, os.path.join(account_dir, 'cube.arrow'))
+        write_columnar(daily, os.path.join(account_dir, 'daily.arrow'))
+        write_columnar(latest_occurrences(prepared), os.path.join(account_dir, 'recurring.arrow'))
+
+        self.catalog['accounts'][account] = {
+            'source': path,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'partitions': partitions,
+        }
+
+    def accounts(self):
+        return sorted(self.catalog['accounts'])
+
+    # [(account, month key)] of the partitions of `accounts` in `months` (None for all)
+    def prune(self, accounts, months=None):
+        keys = _month_keys(months)
+        return [(account, month)
+                for account in accounts
+                for month in sorted(self.catalog['accounts'][account]['partitions'])
+                if keys is None or month in keys]
+
+    # Months with data in any of `accounts`, as timestamps (like LedgerSnapshot.months)
+    def months(self, accounts):
+        keys = sorted({month for _, month in self.prune(accounts)})
+        return list(pd.PeriodIndex(keys, freq='M').to_timestamp())
+
+    # First and last dates of `accounts`, or None when they have no rows
+    def date_range(self, accounts):
+        partitions = [self.catalog['accounts'][account]['partitions'][month] for account, month in self.prune(accounts)]
+        if not partitions:
+            return None
+        first = min(partition['first'] for partition in partitions)
+        last = max(partition['last'] for partition in partitions)
+        return pd.Timestamp(first).date(), pd.Timestamp(last).date()
+
+    def _read_partition(self, account, month):
+        rows = read_columnar([os.path.join(self._account_dir(account), month + '.arrow')])
+        rows['Conta'] = account
+        return rows
+
+    # Raw rows of the pruned partitions, with the account in a 'Conta' column
+    def load(self, accounts, months=None):
+        frames = [self._read_partition(account, month) for account, month in self.prune(accounts, months)]
+        if not frames:
+            # Nothing selected; keep the columns and dtypes of any partition of these accounts
+            frames = [self._read_partition(account, month).iloc[:0] for account, month in self.prune(accounts)[:1]]
+        return pd.concat(frames, ignore_index=True)
+
+    def _account_aggregates(self, account):
+        if account not in self._aggregates:
+            account_dir = self._account_dir(account)
+            self._aggregates[account] = tuple(read_columnar([os.path.join(account_dir, name)])
+                                              for name in ['cube.arrow', 'daily.arrow', 'recurring.arrow'])
+        return self._aggregates[account]
+
+    def _aggregate_frames(self, accounts, months, which):
+        keys = _month_keys(months)
+        frames = [self._account_aggregates(account)[which] for account in accounts]
+        frame = pd.concat(frames, ignore_index=True)
+        return frame if keys is None else frame[frame['AnoMes'].isin(_month_ordinals(keys))]
+
+    # (AnoMes, Tipo, Categoria) -> Valor summed across `accounts`, from the pre-aggregates
+    def cube(self, accounts, months=None):
+        frame = self._aggregate_frames(accounts, months, 0)
+        if len(accounts) > 1:
+            frame = frame.groupby(['AnoMes', 'Tipo', 'Categoria'], as_index=False)['Valor'].sum()
+        index = pd.MultiIndex.from_arrays([pd.PeriodIndex.from_ordinals(frame['AnoMes'], freq='M'),
+                                           frame['Tipo'], frame['Categoria']], names=['AnoMes', 'Tipo', 'Categoria'])
+        return pd.Series(frame['Valor'].to_numpy(), index=index, name='Valor')
+
+    # (Data, Tipo) -> Valor, rows summed across `accounts`, from the pre-aggregates
+    def daily(self, accounts, months=None):
+        frame = self._aggregate_frames(accounts, months, 1)
+        if len(accounts) > 1:
+            frame = frame.groupby(['Data', 'Tipo'], as_index=False)[['Valor', 'rows']].sum()
+        return frame.set_index(['Data', 'Tipo'])[['Valor', 'rows']]
+
+    # LedgerSnapshot of `accounts` holding only the rows of `months` (None for all). Its
+    # daily totals cover every month: they are small, and with them the prefix sums give
+    # running balances from the start of the ledger, not of the months loaded.
+    def snapshot(self, accounts, months=None):
+        keys = _month_keys(months)
+        cache_key = (tuple(accounts), None if keys is None else tuple(sorted(keys)), self.version)
+        with self._lock:
+            if cache_key in self._snapshots:
+                self._snapshots.move_to_end(cache_key)
+                return self._snapshots[cache_key]
+
+            snapshot = LedgerSnapshot(prepare_ledger(self.load(accounts, months)),
+                                      cube=self.cube(accounts, months),
+                                      daily=self.daily(accounts))
+            snapshot.version = self.version
+            self._snapshots[cache_key] = snapshot
+            while len(self._snapshots) > SNAPSHOT_CACHE_SIZE:
+                self._snapshots.popitem(last=False)
+            return snapshot
+
+    # Forecast of the whole ledger of `accounts` (see forecast.py), from the stored latest
+    # occurrences of their recurring series, so no partition is loaded
+    def forecast(self, accounts, horizon, scenarios):
+        horizon, scenarios = forecast_key(horizon, scenarios)
+        key = (tuple(accounts), horizon, scenarios)
+        with self._lock:
+            if key not in self._forecasts:
+                occurrences = combine_occurrences([self._account_aggregates(account)[2] for account in accounts])
+                date_range = self.date_range(accounts)
+                end = None if date_range is None else pd.Period(date_range[1], 'M').ordinal
+                self._forecasts[key] = Forecast(active_series(occurrences, end), end, horizon, scenarios)
+            return self._forecasts[key]
+
+    def view(self, accounts):
+        return AccountsView(self, accounts)
+
+
+# The selected accounts as seen by the dashboard filters: picker options come from the
+# catalog, and for_months loads a snapshot of just the months a filter needs
+class AccountsView:
+    def __init__(self, catalog, accounts):
+        self.catalog = catalog
+        self.accounts = list(accounts)
+        self.months = catalog.months(self.accounts)
+        self.date_range = catalog.date_range(self.accounts)
+
+    def for_months(self, months):
+        return self.catalog.snapshot(self.accounts, months)
+
+    def forecast(self, horizon, scenarios):
+        return self.catalog.forecast(self.accounts, horizon, scenarios)
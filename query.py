@@ -0,0 +1,158 @@
+# Query backends for the dashboard's date filters and aggregations.
+#
+# Every backend answers the same questions about one LedgerSnapshot and returns the same
+# small pandas results as the ledger functions:
+#   cube_for_range / cube_months         - (AnoMes, Tipo, Categoria) -> Valor
+# PandasBackend serves them from the snapshot's in-memory cube (ledger.py). Daily figures
+# don't need a backend: they are slices of the snapshot's prefix sums (ledger.PrefixSums).
+# DuckDBBackend and SQLiteBackend push the date filter and the GROUP BY down into an
+# embedded SQL engine over the ledger's rows, so only the aggregated result comes back.
+# DuckDB is columnar and multi-threaded; it is optional (pip install duckdb).
+#
+# QUERY_BACKEND picks the backend: 'pandas' (the default), 'duckdb', 'sqlite', or 'auto'
+# (DuckDB when installed, otherwise pandas). The pandas path answers from aggregates built
+# once per snapshot, which wins while the ledger fits in memory (benchmarks/bench_query.py);
+# the SQL engines scan the rows on every query and suit ledgers too large for that.
+import importlib.util
+import os
+import sqlite3
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from ledger import cube_for_range, cube_months
+
+QUERY_BACKEND = os.environ.get('QUERY_BACKEND', 'pandas')
+
+CUBE_LEVELS = ['AnoMes', 'Tipo', 'Categoria']
+
+
+# Backends keep what they query, never the snapshot: they are cached per snapshot in a
+# WeakKeyDictionary, and a reference back to the key would keep every snapshot alive
+class PandasBackend:
+    name = 'pandas'
+
+    def __init__(self, snapshot):
+        self.df = snapshot.df
+        self.cube = snapshot.cube
+
+    def cube_for_range(self, start, end):
+        return cube_for_range(self.df, self.cube, start, end)
+
+    def cube_months(self, months):
+        return cube_months(self.cube, months)
+
+
+# Columns the SQL backends load: dates as epoch days and months as period ordinals, so
+# both engines filter and group on plain integers
+def _sql_columns(df):
+    data = df['Data'].to_numpy().astype('datetime64[D]')
+    valid = ~np.isnat(data)
+    return {
+        'dia': pa.array(data.astype(np.int64), mask=~valid),
+        'mes': pa.array(df['AnoMes'].array.asi8, mask=~valid),
+        'Tipo': pa.array(df['Tipo'].astype(str).to_numpy()),
+        'Categoria': pa.array(df['Categoria'].astype(str).to_numpy()),
+        'Valor': pa.array(df['Valor'].to_numpy()),
+    }
+
+
+def _day_bounds(start, end):
+    start = pd.Timestamp(start).normalize()
+    end = pd.Timestamp(end).normalize() + pd.Timedelta(days=1)
+    return [int(start.to_datetime64().astype('datetime64[D]').astype(np.int64)),
+            int(end.to_datetime64().astype('datetime64[D]').astype(np.int64))]
+
+
+def _month_ordinals(months):
+    return sorted({pd.Period(month, 'M').ordinal for month in months})
+
+
+# SQL shared by the DuckDB and SQLite backends; subclasses run it with _query(sql, params),
+# which returns the result as a DataFrame
+class _SQLBackend:
+    CUBE_SQL = ('SELECT mes, Tipo, Categoria, SUM(Valor) AS Valor FROM ledger WHERE {where} '
+                'GROUP BY mes, Tipo, Categoria ORDER BY mes, Tipo, Categoria')
+
+    def _cube(self, where, params):
+        frame = self._query(self.CUBE_SQL.format(where=where), params)
+        index = pd.MultiIndex.from_arrays([pd.PeriodIndex.from_ordinals(frame['mes'].to_numpy(np.int64), freq='M'),
+                                           frame['Tipo'], frame['Categoria']], names=CUBE_LEVELS)
+        return pd.Series(frame['Valor'].to_numpy(np.float64), index=index, name='Valor')
+
+    @staticmethod
+    def _in(column, values):
+        return f"{column} IN ({', '.join('?' * len(values))})" if values else '0' # 0: false in both engines
+
+    def cube_for_range(self, start, end):
+        return self._cube('dia >= ? AND dia < ?', _day_bounds(start, end))
+
+    def cube_months(self, months):
+        ordinals = _month_ordinals(months)
+        return self._cube(self._in('mes', ordinals), ordinals)
+
+
+class DuckDBBackend(_SQLBackend):
+    name = 'duckdb'
+
+    def __init__(self, snapshot):
+        import duckdb # Optional dependency; see resolve_kind
+        rows = pa.table(_sql_columns(snapshot.df))
+        self._con = duckdb.connect()
+        # A real table rather than a registered view: registrations are local to one
+        # connection, while the table is visible to every cursor
+        self._con.execute('CREATE TABLE ledger AS SELECT * FROM rows')
+
+    def _query(self, sql, params):
+        cursor = self._con.cursor() # One cursor per call; sessions query from separate threads
+        try:
+            return cursor.execute(sql, params).fetch_arrow_table().to_pandas()
+        finally:
+            cursor.close()
+
+
+class SQLiteBackend(_SQLBackend):
+    name = 'sqlite'
+
+    def __init__(self, snapshot):
+        self._con = sqlite3.connect(':memory:', check_same_thread=False)
+        self._lock = threading.Lock()
+        columns = _sql_columns(snapshot.df)
+        self._con.execute('CREATE TABLE ledger (dia INTEGER, mes INTEGER, Tipo TEXT, Categoria TEXT, Valor REAL)')
+        self._con.executemany('INSERT INTO ledger VALUES (?, ?, ?, ?, ?)',
+                              zip(*(column.to_pylist() for column in columns.values())))
+        self._con.execute('CREATE INDEX ledger_dia ON ledger (dia)')
+        self._con.execute('CREATE INDEX ledger_mes ON ledger (mes)')
+
+    def _query(self, sql, params):
+        with self._lock:
+            cursor = self._con.execute(sql, params)
+            rows = cursor.fetchall()
+            names = [column[0] for column in cursor.description]
+        return pd.DataFrame.from_records(rows, columns=names)
+
+
+BACKENDS = {'pandas': PandasBackend, 'duckdb': DuckDBBackend, 'sqlite': SQLiteBackend}
+
+_backends = weakref.WeakKeyDictionary() # snapshot -> {kind: backend}, dropped with the snapshot
+_backends_lock = threading.Lock()
+
+
+# 'auto' resolves to DuckDB when it is installed, otherwise to pandas
+def resolve_kind(kind=QUERY_BACKEND):
+    if kind == 'auto':
+        return 'duckdb' if importlib.util.find_spec('duckdb') is not None else 'pandas'
+    return kind
+
+
+# Backend of the given kind over `snapshot`, built once per snapshot
+def get_backend(snapshot, kind=QUERY_BACKEND):
+    kind = resolve_kind(kind)
+    with _backends_lock:
+        per_snapshot = _backends.setdefault(snapshot, {})
+        if kind not in per_snapshot:
+            per_snapshot[kind] = BACKENDS[kind](snapshot)
+        return per_snapshot[kind]
@@ -0,0 +1,57 @@
+# Chart rendering backend: renders independent charts to PNG bytes, either in the calling
+# thread or concurrently on a pool of worker processes. matplotlib (via charts.py) is only
+# imported when the first chart is rendered, so importing the dashboard stays cheap.
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Worker processes used by the dashboard (RENDER_WORKERS=0 renders in the calling thread)
+_cpus = os.cpu_count() or 1
+RENDER_WORKERS = int(os.environ.get('RENDER_WORKERS', min(4, _cpus) if _cpus > 1 else 0))
+
+
+# Warning shown instead of a chart when the selection has no data for it
+EMPTY_MESSAGES = {
+    'monthly_cashflow': "Nenhum dado de fluxo de caixa disponível para o período selecionado.",
+    'monthly_income': "Nenhum dado de receita mensal disponível para o período selecionado.",
+    'expense_distribution_bar': "Nenhum dado de despesas por categoria disponível para os filtros selecionados.",
+    'expense_distribution_pie': "Nenhum dado de despesas por categoria disponível para os filtros selecionados.",
+    'cumulative_balance': "Nenhum dado de saldo disponível para o período selecionado.",
+    'cumulative_savings': "Dados de economias insuficientes para plotar as economias acumuladas.",
+    'monthly_category_expenses': "Nenhum dado de despesas mensais por categoria disponível para os filtros selecionados.",
+}
+
+
+# Render one chart to PNG bytes, or None when it has no data
+def render_chart(chart_id, data):
+    from charts import CHARTS, figure_to_png # Deferred: loads matplotlib and the theme
+    fig = CHARTS[chart_id](data)
+    return None if fig is None else figure_to_png(fig)
+
+
+def create_pool(workers=RENDER_WORKERS):
+    if workers <= 0:
+        return None
+    # Spawn rather than fork: the Streamlit server process is multi-threaded
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+# Render one chart, returning (PNG bytes or None, seconds spent)
+def _render_timed(chart_id, data):
+    start = time.perf_counter()
+    image = render_chart(chart_id, data)
+    return image, time.perf_counter() - start
+
+
+# Render {chart_id: data} to {chart_id: PNG bytes or None}, concurrently when a pool is given.
+# When `timings` is a dict, each chart's render time in seconds is stored in it.
+def render_charts(jobs, pool=None, timings=None):
+    if pool is None or len(jobs) < 2:
+        results = {chart_id: _render_timed(chart_id, data) for chart_id, data in jobs.items()}
+    else:
+        futures = {chart_id: pool.submit(_render_timed, chart_id, data) for chart_id, data in jobs.items()}
+        results = {chart_id: future.result() for chart_id, future in futures.items()}
+    if timings is not None:
+        timings.update({chart_id: seconds for chart_id, (_, seconds) in results.items()})
+    return {chart_id: image for chart_id, (image, _) in results.items()}
@@ -0,0 +1,108 @@
+# Batch summaries of one or more ledgers, without Streamlit, e.g. for nightly reports.
+#
+#   python report.py fluxo_caixa.xlsx --period 2025-06-01:2025-08-31 --month 2025-07 --format json
+#   python report.py a.xlsx b.xlsx --format csv --workers 2 -o report.csv
+#
+# Every ledger is summarized for the whole range plus each --period (inclusive dates) and
+# --month given. JSON holds, per ledger and period, the totals over the period, the
+# monthly table (totals and month-over-month deltas), the latest-month changes and the
+# expense breakdown by category; CSV holds just the monthly tables, one row per ledger, period and month.
+import argparse
+import json
+import multiprocessing
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from ledger import (MonthlySummary, PrefixSums, build_daily_totals, build_monthly_cube, category_totals,
+                    cube_for_range, cube_months, prepare_ledger)
+from storage import load_ledger
+
+
+# (label, start, end) for "START:END", or (label, month) for "YYYY-MM"
+def parse_period(text):
+    start, sep, end = text.partition(':')
+    if sep:
+        return text, pd.Timestamp(start), pd.Timestamp(end)
+    return text, pd.Period(text, freq='M')
+
+
+# (cube, day bounds in `prefix_sums`) of one period
+def _period_aggregates(df, cube, prefix_sums, period):
+    if period is None:
+        return cube, prefix_sums.range_bounds()
+    if len(period) == 3:
+        return cube_for_range(df, cube, period[1], period[2]), prefix_sums.range_bounds(period[1], period[2])
+    return cube_months(cube, [period[1]]), prefix_sums.month_bounds([period[1]])
+
+
+def _month_key(month):
+    return month.strftime('%Y-%m')
+
+
+# Summaries of one ledger for each period (None is the whole ledger)
+def summarize_ledger(path, periods):
+    df = prepare_ledger(load_ledger(path))
+    cube = build_monthly_cube(df)
+    prefix_sums = PrefixSums(build_daily_totals(df))
+    reports = []
+    for period in [None] + list(periods):
+        period_cube, bounds = _period_aggregates(df, cube, prefix_sums, period)
+        summary = MonthlySummary(prefix_sums, bounds)
+        table = summary.table().round(2)
+        expenses = category_totals(period_cube, 'Expense').sort_values(ascending=False).round(2)
+        reports.append({
+            'file': path,
+            'period': 'all' if period is None else period[0],
+            'totals': {key: round(total, 2) for key, total in summary.totals().items()},
+            'months': {_month_key(month): row for month, row in table.to_dict('index').items()},
+            'latest': {key: {'total': round(float(total), 2), 'change': round(float(change), 2)}
+                       for key, (total, change) in summary.latest().items()},
+            'expense_by_category': {str(category): float(value) for category, value in expenses.items()},
+        })
+    return reports
+
+
+# Summaries for every ledger, one per worker process when `workers` > 0
+def run_batch(paths, periods, workers=0):
+    if workers <= 0 or len(paths) < 2:
+        return [report for path in paths for report in summarize_ledger(path, periods)]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        results = pool.map(summarize_ledger, paths, [periods] * len(paths))
+        return [report for reports in results for report in reports]
+
+
+def reports_to_frame(reports):
+    rows = [{'file': report['file'], 'period': report['period'], 'month': month, **values}
+            for report in reports for month, values in report['months'].items()]
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Resumo financeiro de um ou mais arquivos de fluxo de caixa.')
+    parser.add_argument('paths', nargs='+', help='Excel ledgers to summarize')
+    parser.add_argument('--period', action='append', default=[], help='Inclusive date range, START:END')
+    parser.add_argument('--month', action='append', default=[], help='Single month, YYYY-MM')
+    parser.add_argument('--format', choices=['json', 'csv'], default='json')
+    parser.add_argument('--workers', type=int, default=0, help='Summarize ledgers on this many processes')
+    parser.add_argument('-o', '--output', help='Output file (default: stdout)')
+    args = parser.parse_args(argv)
+
+    periods = [parse_period(text) for text in args.period + args.month]
+    reports = run_batch(args.paths, periods, args.workers)
+
+    out = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    try:
+        if args.format == 'json':
+            json.dump(reports, out, ensure_ascii=False, indent=2)
+            out.write('\n')
+        else:
+            reports_to_frame(reports).to_csv(out, index=False)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == '__main__':
+    main()
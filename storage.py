@@ -0,0 +1,231 @@
+# Columnar cache in front of the Excel ledger.
+#
+# The workbook is parsed with openpyxl only when its contents change; every other
+# load memory-maps uncompressed Arrow IPC segments kept next to a small JSON sidecar
+# describing the source file they were built from. A changed workbook is streamed in
+# chunks (streaming.LedgerStreamReader) into a staged Arrow file, one record batch per
+# chunk, so ingesting never holds the whole sheet in memory. openpyxl can't start reading
+# at a given row, so the sheet is always read whole; when its cached rows are still its
+# first rows unchanged, only the rows after them are kept, as an extra segment.
+import hashlib
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from streaming import CHUNK_SIZE, LedgerStreamReader
+
+CACHE_DIR = '.ledger_cache'
+
+
+# Hash the source file in chunks so large workbooks don't have to fit in memory twice
+def file_digest(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# One hash per row that doesn't depend on how pandas inferred the dtypes, so the same rows
+# hash the same whether or not later rows (with NaNs, say) widened a column's type
+def row_hashes(df):
+    numeric = df.select_dtypes('number').columns
+    normalized = df.astype({column: 'float64' for column in numeric}).astype(str)
+    return pd.util.hash_pandas_object(normalized, index=False).to_numpy()
+
+
+# Hash of a frame's contents, insensitive to inferred dtypes (see row_hashes)
+def frame_digest(df):
+    return hashlib.sha256(row_hashes(df).tobytes()).hexdigest()
+
+
+# Cache files are named after the workbook plus a short hash of its absolute path, so
+# workbooks with the same name in different folders (one per account, say) don't share them
+def _cache_base(path, cache_dir):
+    name = os.path.splitext(os.path.basename(path))[0]
+    key = hashlib.sha256(os.path.abspath(path).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(cache_dir, f'{name}-{key}')
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# Write to a temporary file first so a concurrent reader never sees a half-written file
+def _write_atomic(target, write):
+    tmp = target + '.tmp'
+    write(tmp)
+    os.replace(tmp, target)
+
+
+def _write_meta(meta_path, meta):
+    def write(tmp):
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+    _write_atomic(meta_path, write)
+
+
+def read_excel_ledger(path):
+    return pd.read_excel(path, parse_dates=['Data'])
+
+
+def write_columnar(df, arrow_path, schema=None):
+    table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+    _write_atomic(arrow_path, lambda tmp: feather.write_feather(table, tmp, compression='uncompressed'))
+
+
+# Write `frames` (chunks of one sheet) to `target` as Arrow IPC, a record batch per frame.
+# Integer columns are stored as float64, since a chunk with blank cells reads as floats;
+# later chunks take the column types of the first. Returns (rows, digest of every row,
+# digest of the first `n_prefix` rows), digests of the row hashes (see row_hashes) of the
+# rows as they read back from the cache.
+def _write_frames(frames, target, n_prefix):
+    digest, prefix_digest = hashlib.sha256(), hashlib.sha256()
+    n_rows = 0
+
+    def write(tmp):
+        nonlocal n_rows
+        writer = schema = None
+        try:
+            for frame in frames:
+                frame = frame.astype({column: 'float64' for column in frame.select_dtypes('integer').columns})
+                table = pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+                if writer is None:
+                    schema = table.schema
+                    writer = pa.ipc.new_file(tmp, schema)
+                writer.write_table(table)
+                hashes = row_hashes(table.to_pandas())
+                digest.update(hashes.tobytes())
+                prefix_digest.update(hashes[:max(n_prefix - n_rows, 0)].tobytes())
+                n_rows += len(hashes)
+        finally:
+            if writer is not None:
+                writer.close()
+
+    _write_atomic(target, write)
+    return n_rows, digest.hexdigest(), prefix_digest.hexdigest()
+
+
+# Write the workbook at `path` to `target` in chunks (see _write_frames). A sheet whose
+# later rows don't fit the column types of its first chunk is read whole instead.
+def write_ledger_columnar(path, target, n_prefix=0, chunk_size=CHUNK_SIZE):
+    try:
+        return _write_frames(LedgerStreamReader(path, chunk_size).frames(), target, n_prefix)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return _write_frames([read_excel_ledger(path)], target, n_prefix)
+
+
+def read_columnar(arrow_paths):
+    # Uncompressed IPC files can be memory-mapped, so only the pages pandas touches are read
+    tables = [feather.read_table(arrow_path, memory_map=True) for arrow_path in arrow_paths]
+    return pa.concat_tables(tables).to_pandas()
+
+
+def _segment_paths(cache_dir, meta):
+    return [os.path.join(cache_dir, segment) for segment in meta['segments']]
+
+
+# Sidecar metadata; `rows_digest` covers every cached row, so any edit to them is caught
+def _source_meta(stat, digest, n_rows, rows_digest, segments):
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': digest,
+        'n_rows': n_rows,
+        'rows_digest': rows_digest,
+        'segments': segments,
+    }
+
+
+# Return (status, meta, stat, digest) for the cached copy of `path`, where status is
+# 'fresh', 'changed' or 'missing'. The cheap size/mtime check is tried first; the content
+# hash only decides when the file was touched.
+def check_cache(path, cache_dir=CACHE_DIR):
+    meta = _read_meta(_cache_base(path, cache_dir) + '.meta.json')
+    stat = os.stat(path)
+    if meta is None or not all(os.path.exists(p) for p in _segment_paths(cache_dir, meta)):
+        return 'missing', meta, stat, file_digest(path)
+
+    if meta['size'] == stat.st_size and meta['mtime_ns'] == stat.st_mtime_ns:
+        return 'fresh', meta, stat, meta['sha256']
+
+    digest = file_digest(path)
+    return ('fresh' if meta['sha256'] == digest else 'changed'), meta, stat, digest
+
+
+# Store the rows of the staged workbook after its first `n_cached` as a new segment with
+# the cached column types. Returns them, or None when they don't fit those types.
+def _append_segment(staged_path, n_cached, cache_dir, meta, segment):
+    schema = pa.ipc.open_file(pa.memory_map(_segment_paths(cache_dir, meta)[0])).schema
+    try:
+        table = feather.read_table(staged_path, memory_map=True).slice(n_cached).cast(schema)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError, ValueError): # Also mismatched column names
+        return None
+    _write_atomic(os.path.join(cache_dir, segment),
+                  lambda tmp: feather.write_feather(table, tmp, compression='uncompressed'))
+    return table.to_pandas()
+
+
+# Bring the cache up to date with the workbook. Returns (mode, appended) where mode is
+# 'unchanged', 'appended' (only the returned new rows were added to the cache) or
+# 'rebuilt' (the cache was written again from the whole workbook).
+def ingest_ledger(path, cache_dir=CACHE_DIR):
+    base = _cache_base(path, cache_dir)
+    meta_path = base + '.meta.json'
+    status, meta, stat, digest = check_cache(path, cache_dir)
+
+    if status == 'fresh':
+        if (meta['size'], meta['mtime_ns']) != (stat.st_size, stat.st_mtime_ns):
+            # File was touched but not changed; keep the next check cheap
+            _write_meta(meta_path, {**meta, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns})
+        return 'unchanged', None
+
+    os.makedirs(cache_dir, exist_ok=True)
+    staged = base + '.staged.arrow'
+    n_cached = meta['n_rows'] if status == 'changed' else 0
+    n_rows, rows_digest, prefix_digest = write_ledger_columnar(path, staged, n_cached)
+    if status == 'changed' and n_rows >= n_cached and prefix_digest == meta.get('rows_digest'):
+        if n_rows == n_cached: # Saved without edits
+            os.remove(staged)
+            _write_meta(meta_path, _source_meta(stat, digest, n_rows, rows_digest, meta['segments']))
+            return 'unchanged', None
+        segment = f'{os.path.basename(base)}.{len(meta["segments"])}.arrow'
+        appended = _append_segment(staged, n_cached, cache_dir, meta, segment)
+        if appended is not None:
+            os.remove(staged)
+            _write_meta(meta_path, _source_meta(stat, digest, n_rows, rows_digest, meta['segments'] + [segment]))
+            return 'appended', appended
+        # The new rows don't fit the cached column types; rebuild below
+
+    segment = os.path.basename(base) + '.arrow'
+    os.replace(staged, os.path.join(cache_dir, segment))
+    _write_meta(meta_path, _source_meta(stat, digest, n_rows, rows_digest, [segment]))
+    if meta is not None:
+        for stale in set(meta['segments']) - {segment}:
+            try:
+                os.remove(os.path.join(cache_dir, stale))
+            except OSError:
+                pass
+    return 'rebuilt', None
+
+
+def read_cache_meta(path, cache_dir=CACHE_DIR):
+    return _read_meta(_cache_base(path, cache_dir) + '.meta.json')
+
+
+# Read the cached ledger (call ingest_ledger first to bring it up to date)
+def read_cached_ledger(path, cache_dir=CACHE_DIR):
+    return read_columnar(_segment_paths(cache_dir, read_cache_meta(path, cache_dir)))
+
+
+# Load the ledger, re-parsing the workbook only when it has actually changed
+def load_ledger(path, cache_dir=CACHE_DIR):
+    ingest_ledger(path, cache_dir)
+    return read_cached_ledger(path, cache_dir)
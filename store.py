@@ -0,0 +1,83 @@
+# Process-wide holder of the current ledger snapshot.
+#
+# The dashboard asks the store for the current snapshot on every rerun. When the workbook
+# changes, rows that were only appended are folded into the existing snapshot
+# (LedgerSnapshot.append); any other change rebuilds it from the columnar cache.
+# Sessions all read the same snapshot object; the store only ever swaps in a new one, so a
+# session keeps a consistent view of one version for the whole rerun. Building and
+# publishing are separate steps so a background watcher (warmer.py) can warm a new
+# version before any session sees it.
+import os
+import threading
+
+from ledger import LedgerSnapshot, prepare_ledger
+from storage import CACHE_DIR, ingest_ledger, read_cache_meta, read_cached_ledger
+
+
+class LedgerStore:
+    def __init__(self, path, cache_dir=CACHE_DIR):
+        self.path = path
+        self.cache_dir = cache_dir
+        self.snapshot = None # Published snapshot, the one sessions read
+        self.version = 0 # Bumped whenever the snapshot's contents change
+        self.watched = False # Set by warmer.LedgerWatcher, which then publishes new versions
+        self._latest = None # Last built snapshot, published or not; the base for appends
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    # Current snapshot. Unwatched, it is refreshed first if the workbook's mtime changed;
+    # watched, the watcher rebuilds it in the background and this returns the last
+    # published snapshot without waiting.
+    def current(self):
+        snapshot = self.snapshot
+        if self.watched and snapshot is not None:
+            return snapshot
+        with self._lock:
+            # With nothing new to build, the latest build is still published: the watcher may
+            # be warming its first one while this session has nothing to show yet
+            self._publish(self._build() or self._latest)
+            return self.snapshot
+
+    # Next snapshot if the workbook changed since the last build, otherwise None. It isn't
+    # visible to sessions until it is passed to publish().
+    def build(self):
+        with self._lock:
+            return self._build()
+
+    # Last built snapshot, published or not
+    @property
+    def latest(self):
+        return self._latest
+
+    # Make `snapshot` the current one: a single assignment, so a session reads either the
+    # old or the new version, never a mix
+    def publish(self, snapshot):
+        with self._lock:
+            self._publish(snapshot)
+
+    def _build(self):
+        mtime = os.path.getmtime(self.path)
+        if self._latest is not None and mtime == self._mtime:
+            return None
+        mode, appended = ingest_ledger(self.path, self.cache_dir)
+        self._mtime = mtime
+        if mode == 'unchanged' and self._latest is not None:
+            return None
+
+        snapshot = None
+        if mode == 'appended' and self._latest is not None:
+            snapshot = self._latest.append(appended)
+            # Another process may have ingested in between; only trust a matching row count
+            if snapshot is not None and len(snapshot.df) != read_cache_meta(self.path, self.cache_dir)['n_rows']:
+                snapshot = None
+        if snapshot is None:
+            snapshot = LedgerSnapshot(prepare_ledger(read_cached_ledger(self.path, self.cache_dir)))
+
+        snapshot.version = (self._latest.version if self._latest is not None else 0) + 1
+        self._latest = snapshot
+        return snapshot
+
+    def _publish(self, snapshot):
+        if self.snapshot is None or snapshot.version > self.snapshot.version:
+            self.snapshot = snapshot
+            self.version = snapshot.version
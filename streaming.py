@@ -0,0 +1,142 @@
+# Streaming reader for very large workbooks.
+#
+# pd.read_excel materializes the whole sheet at once. LedgerStreamReader instead walks the
+# sheet with openpyxl's read-only mode and yields it in fixed-size chunks: as DataFrames of
+# every column (frames), which storage.ingest_ledger writes to the columnar cache one
+# record batch at a time, or as compact typed arrays, which StreamingAggregates folds into
+# the monthly cube and the daily totals as they arrive. Either way peak memory is bounded
+# by the chunk size rather than by the size of the file.
+import numpy as np
+import pandas as pd
+
+CHUNK_SIZE = 50_000
+
+
+# Map values to stable int32 codes, growing `dictionary` (value -> code) as new values appear
+def encode(values, dictionary):
+    local_codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+    global_codes = np.array([dictionary.setdefault(value, len(dictionary)) for value in uniques], dtype=np.int32)
+    codes = np.full(len(local_codes), -1, dtype=np.int32) # -1 marks a missing value
+    present = local_codes >= 0
+    codes[present] = global_codes[local_codes[present]]
+    return codes
+
+
+def _decode(codes, dictionary):
+    labels = np.empty(len(dictionary), dtype=object)
+    for value, code in dictionary.items():
+        labels[code] = value
+    return labels[codes]
+
+
+class LedgerStreamReader:
+    def __init__(self, path, chunk_size=CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.tipos = {}      # Tipo -> code
+        self.categorias = {} # Categoria -> code
+        self.rows_read = 0
+
+    # Yield a DataFrame of every column for every `chunk_size` rows, typed the way
+    # pd.read_excel types a sheet (Data parsed as dates); blank rows are skipped. A sheet
+    # with a header and no rows yields one empty frame, so callers always see the columns.
+    def frames(self):
+        import openpyxl # Deferred: only needed when a workbook changed, and slow to import
+        workbook = openpyxl.load_workbook(self.path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            columns = [f'Unnamed: {i}' if name is None else name for i, name in enumerate(header)]
+
+            chunk, chunks = [], 0
+            for row in rows:
+                if all(value is None for value in row):
+                    continue
+                chunk.append(row[:len(columns)])
+                if len(chunk) == self.chunk_size:
+                    yield self._frame(chunk, columns)
+                    chunk, chunks = [], chunks + 1
+            if chunk or not chunks:
+                yield self._frame(chunk, columns)
+        finally:
+            workbook.close()
+
+    def _frame(self, chunk, columns):
+        self.rows_read += len(chunk)
+        frame = pd.DataFrame.from_records(chunk, columns=columns)
+        if 'Data' in frame.columns and frame['Data'].dtype.kind != 'M':
+            frame['Data'] = pd.to_datetime(frame['Data'], errors='coerce')
+        return frame
+
+    # Yield dicts of arrays for every `chunk_size` rows:
+    #   valor     - float64
+    #   day       - int32 days since 1970-01-01
+    #   tipo      - int32 code into self.tipos
+    #   categoria - int32 code into self.categorias
+    # Rows without a date or a value are skipped.
+    def __iter__(self):
+        for frame in self.frames():
+            yield self._compact(frame)
+
+    def _compact(self, frame):
+        days = frame['Data'].to_numpy().astype('datetime64[D]')
+        valor = pd.to_numeric(frame['Valor'], errors='coerce').to_numpy(dtype=np.float64)
+        keep = ~np.isnat(days) & ~np.isnan(valor)
+        return {
+            'valor': valor[keep],
+            'day': days[keep].astype(np.int64).astype(np.int32),
+            'tipo': encode(frame['Tipo'].to_numpy(dtype=object)[keep], self.tipos),
+            'categoria': encode(frame['Categoria'].to_numpy(dtype=object)[keep], self.categorias),
+        }
+
+
+# Running monthly cube and daily totals, fed one compact chunk at a time
+class StreamingAggregates:
+    def __init__(self, reader):
+        self.reader = reader
+        self._cube = None
+        self._daily = None
+
+    def add(self, chunk):
+        months = chunk['day'].astype('datetime64[D]').astype('datetime64[M]').astype(np.int32)
+        frame = pd.DataFrame({'month': months, 'tipo': chunk['tipo'], 'categoria': chunk['categoria'],
+                              'day': chunk['day'], 'valor': chunk['valor']})
+        cube = frame.groupby(['month', 'tipo', 'categoria'])['valor'].sum()
+        daily = frame.groupby(['day', 'tipo'])['valor'].agg(Valor='sum', rows='size')
+        self._cube = cube if self._cube is None else self._cube.add(cube, fill_value=0)
+        self._daily = daily if self._daily is None else self._daily.add(daily, fill_value=0)
+
+    # Same shape as ledger.build_monthly_cube: (AnoMes, Tipo, Categoria) -> Valor
+    def cube(self):
+        if self._cube is None:
+            return pd.Series(dtype=np.float64, name='Valor')
+        month, tipo, categoria = (self._cube.index.get_level_values(i).to_numpy() for i in range(3))
+        index = pd.MultiIndex.from_arrays([
+            pd.PeriodIndex.from_ordinals(month, freq='M'),
+            _decode(tipo, self.reader.tipos),
+            _decode(categoria, self.reader.categorias),
+        ], names=['AnoMes', 'Tipo', 'Categoria'])
+        return pd.Series(self._cube.to_numpy(), index=index, name='Valor').sort_index()
+
+    # Same shape as ledger.build_daily_totals: (Data, Tipo) -> Valor, rows
+    def daily(self):
+        if self._daily is None:
+            return pd.DataFrame({'Valor': [], 'rows': []})
+        day, tipo = (self._daily.index.get_level_values(i).to_numpy() for i in range(2))
+        index = pd.MultiIndex.from_arrays([
+            pd.DatetimeIndex(day.astype('datetime64[D]'), name='Data'),
+            _decode(tipo, self.reader.tipos),
+        ], names=['Data', 'Tipo'])
+        return pd.DataFrame({'Valor': self._daily['Valor'].to_numpy(), 'rows': self._daily['rows'].to_numpy()},
+                            index=index).sort_index()
+
+
+# Monthly cube and daily totals of a workbook, read in bounded memory
+def stream_aggregates(path, chunk_size=CHUNK_SIZE):
+    reader = LedgerStreamReader(path, chunk_size)
+    aggregates = StreamingAggregates(reader)
+    for chunk in reader:
+        aggregates.add(chunk)
+    return aggregates
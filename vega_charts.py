@@ -0,0 +1,110 @@
+# Client-side (Vega-Lite) versions of the cumulative charts.
+#
+# The daily cumulative series grow with the length of the history, so instead of drawing
+# every point into a PNG they are downsampled on the server with LTTB (Largest Triangle
+# Three Buckets, which keeps the visually significant peaks and dips) to at most
+# MAX_POINTS points and sent as a small JSON spec the browser draws, zooms and pans.
+# Each *_spec function returns (data, spec) for st.vega_lite_chart, or None when the
+# selection has no data, like the plot_* functions in charts.py.
+import os
+
+import numpy as np
+import pandas as pd
+
+# Chart backend for the cumulative charts: 'vega' (this module) or 'matplotlib' (charts.py)
+CHART_BACKEND = os.environ.get('CHART_BACKEND', 'vega')
+
+MAX_POINTS = int(os.environ.get('CHART_MAX_POINTS', 1000))
+
+
+# Indices of the `threshold` points of (x, y) that LTTB keeps; x must be increasing.
+# The first and last points are always kept; every bucket in between contributes the
+# point forming the largest triangle with the previously kept point and the average of
+# the next bucket.
+def lttb(x, y, threshold):
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = (np.arange(threshold - 1) * (n - 2) / (threshold - 2)).astype(np.int64) + 1 # Bucket starts
+    edges[-1] = n - 1
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        indices[i + 1] = a
+    return indices
+
+
+# Series with a DatetimeIndex, downsampled with LTTB
+def downsample_series(series, max_points=MAX_POINTS):
+    if len(series) <= max_points:
+        return series
+    x = series.index.to_numpy().astype('datetime64[ns]').astype(np.int64)
+    return series.iloc[lttb(x, series.to_numpy(), max_points)]
+
+
+def _line_spec(field, title, y_title, color):
+    return {
+        'title': title,
+        'mark': {'type': 'line', 'color': color},
+        'encoding': {
+            'x': {'field': 'Data', 'type': 'temporal', 'title': 'Data'},
+            'y': {'field': field, 'type': 'quantitative', 'title': y_title, 'axis': {'format': ',.2f'}},
+            'tooltip': [
+                {'field': 'Data', 'type': 'temporal', 'format': '%d/%m/%Y'},
+                {'field': field, 'type': 'quantitative', 'format': ',.2f'},
+            ],
+        },
+        'params': [{'name': 'zoom', 'select': 'interval', 'bind': 'scales'}], # Zoom and pan in the browser
+    }
+
+
+# Cumulative balance per day (see ledger.PrefixSums.cumulative), or a frame of it ('Saldo')
+# plus projected scenarios (see forecast.extend_balance), drawn as dashed lines after it
+def cumulative_balance_spec(saldo, max_points=MAX_POINTS):
+    projection = None
+    if saldo.ndim == 2:
+        projection = saldo.drop(columns='Saldo')
+        saldo = saldo['Saldo'].dropna()
+    if saldo.empty:
+        return None
+    data = downsample_series(saldo, max_points).rename('Saldo').rename_axis('Data').reset_index()
+    spec = _line_spec('Saldo', 'Saldo Líquido Acumulado ao Longo do Tempo', 'Saldo (R$)', '#2196F3')
+    if projection is None:
+        return data, spec
+
+    # Projections are monthly, so at most MAX_HORIZON points per scenario
+    projected = projection.rename_axis('Data').reset_index().melt('Data', var_name='Série', value_name='Saldo').dropna()
+    projected['Série'] = 'Projeção (' + projected['Série'] + ')'
+    data = pd.concat([data.assign(Série='Realizado'), projected], ignore_index=True)
+    data['Projetado'] = data['Série'] != 'Realizado'
+    del spec['mark']['color']
+    spec['encoding']['color'] = {'field': 'Série', 'type': 'nominal', 'title': None}
+    spec['encoding']['strokeDash'] = {'field': 'Projetado', 'type': 'nominal', 'legend': None}
+    spec['encoding']['tooltip'].insert(0, {'field': 'Série', 'type': 'nominal'})
+    return data, spec
+
+
+# Cumulative savings per day (see ledger.PrefixSums.cumulative)
+def cumulative_savings_spec(cumulative_savings, max_points=MAX_POINTS):
+    if cumulative_savings.empty:
+        return None
+    data = downsample_series(cumulative_savings, max_points).rename('Economias').rename_axis('Data').reset_index()
+    return data, _line_spec('Economias', 'Economias Acumuladas ao Longo do Tempo', 'Economias (R$)', '#2196F3')
+
+
+# Chart id -> spec function, for the charts that have a Vega-Lite version
+VEGA_CHARTS = {
+    'cumulative_balance': cumulative_balance_spec,
+    'cumulative_savings': cumulative_savings_spec,
+}
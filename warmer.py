@@ -0,0 +1,78 @@
+# Background refresh of the ledger store, so no session pays for a new workbook version.
+#
+# LedgerWatcher polls the workbook's mtime on a daemon thread. When it changes, the thread
+# builds the next snapshot (LedgerStore.build) and warms what the first rerun of that
+# version would otherwise compute: its prefix sums, query backend, expense search index
+# and default forecast (warm_snapshot), plus whatever the `warm` callback adds, such as
+# the default view's charts. Only then is the snapshot published (LedgerStore.publish).
+# Until that single swap every session keeps reading the previous version, fully built.
+#
+# LEDGER_WATCH_INTERVAL sets the polling period in seconds; 0 disables the watcher, and
+# the store then refreshes inside the first rerun after a change, as before.
+import os
+import threading
+import time
+
+from diagnostics import log_event, logger
+from expense_table import get_text_index
+from forecast import get_forecast
+from query import get_backend
+
+WATCH_INTERVAL = float(os.environ.get('LEDGER_WATCH_INTERVAL', 2))
+
+
+# Build the snapshot's lazily derived structures now rather than on first use
+def warm_snapshot(snapshot):
+    snapshot.prefix_sums
+    get_backend(snapshot)
+    get_text_index(snapshot)
+    get_forecast(snapshot) # The default projection of the cumulative balance chart
+
+
+class LedgerWatcher:
+    def __init__(self, store, warm=None, interval=WATCH_INTERVAL):
+        self.store = store
+        self.warm = warm # Called with each new snapshot before it is published
+        self.interval = interval
+        self.last_error = None
+        self._warmed_version = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='ledger-watcher', daemon=True)
+
+    def start(self):
+        self.store.watched = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.store.watched = False
+
+    def _run(self):
+        while True:
+            try:
+                self.check()
+            except Exception as exc: # Keep serving the last published version and retry
+                self.last_error = exc
+                logger.exception('Refreshing %s failed', self.store.path)
+            if self._stop.wait(self.interval):
+                return
+
+    # Build, warm and publish a new snapshot if the workbook changed. A snapshot built but
+    # not yet warmed, either by a session (the first one, before the watcher ran) or by an
+    # earlier check whose warm failed, is warmed and published now.
+    # Returns the snapshot warmed, or None when there was nothing to do.
+    def check(self):
+        start = time.perf_counter()
+        snapshot = self.store.build() or self.store.latest
+        if snapshot is None or snapshot.version == self._warmed_version:
+            return None
+        warm_snapshot(snapshot)
+        if self.warm is not None:
+            self.warm(snapshot)
+        self.store.publish(snapshot) # No-op for a snapshot a session already published
+        self._warmed_version = snapshot.version
+        self.last_error = None
+        log_event('prewarm', version=snapshot.version, rows=len(snapshot.df),
+                  ms=round((time.perf_counter() - start) * 1e3, 3))
+        return snapshot